@@ -6,9 +6,10 @@ from flask_mail import Mail
 from flask_bcrypt import Bcrypt
 from flask_wtf.csrf import CSRFProtect
 from config import configs
+from app.replica import RoutingSession
 import os
 
-db      = SQLAlchemy()
+db      = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login   = LoginManager()
 mail    = Mail()
@@ -32,13 +33,20 @@ def create_app(env: str = None) -> Flask:
     )
     app.config.from_object(configs[env])
 
+    from app.search import include_object
     db.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, include_object=include_object)
     login.init_app(app)
     mail.init_app(app)
     bcrypt.init_app(app)
     csrf.init_app(app)
 
+    from app import assets, fragments, metrics, scheduler
+    assets.init_app(app)
+    fragments.init_app(app)
+    metrics.init_app(app)
+    scheduler.init_app(app)
+
     from app.routes.auth  import auth_bp
     from app.routes.todos import todos_bp
     from app.routes.main  import main_bp
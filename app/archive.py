@@ -0,0 +1,69 @@
+"""Hot/cold split: completed todos older than ``ARCHIVE_AFTER_DAYS`` move to ``todos_archive``.
+
+The scheduler's ``archive`` job moves them ``ARCHIVE_CHUNK`` rows per
+transaction, so ``todos`` and its indexes grow with open work rather than
+with history. Archived rows are read only by the archive view and API.
+Un-completing one moves it back as a fresh active todo (new id, original
+``created_at``).
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.changes import touch
+from app.models import Todo, ArchivedTodo
+
+log = logging.getLogger(__name__)
+
+# columns copied as-is between the two tables
+COLUMNS = ('title', 'priority', 'due_date', 'due_time', 'created_at', 'completed_at', 'user_id')
+
+
+def archive(days=None, chunk=None) -> int:
+    """Move completed todos finished more than ``days`` ago; returns the row count. Needs an app context."""
+    days  = current_app.config.get('ARCHIVE_AFTER_DAYS') if days is None else days
+    chunk = chunk or current_app.config.get('ARCHIVE_CHUNK', 1000)
+    if not days:
+        return 0
+    cutoff, total = datetime.utcnow() - timedelta(days=days), 0
+    while True:
+        rows = db.session.query(Todo.id, Todo.user_id).filter(Todo.completed, Todo.completed_at < cutoff)\
+                         .order_by(Todo.completed_at, Todo.id).limit(chunk).all()
+        if not rows:
+            break
+        ids = [id for id, _ in rows]
+        src = db.select(Todo.id, *(getattr(Todo, c) for c in COLUMNS), db.literal(datetime.utcnow()))\
+                .where(Todo.id.in_(ids))
+        db.session.execute(db.insert(ArchivedTodo).from_select(['todo_id', *COLUMNS, 'archived_at'], src))
+        Todo.query.filter(Todo.id.in_(ids)).delete(synchronize_session=False)
+        by_user = defaultdict(list)
+        for id, uid in rows:
+            by_user[uid].append(('delete', id))
+        for uid, changes in by_user.items():
+            touch(uid, *changes)
+        db.session.commit()
+        total += len(ids)
+    if total:
+        log.info('Archived %d completed todos', total)
+    return total
+
+
+def page(user_id, before=None, limit=50):
+    """``(rows, next_before)`` of the user's archive, most recently archived first."""
+    query = ArchivedTodo.query.filter(ArchivedTodo.user_id == user_id)
+    if before:
+        query = query.filter(ArchivedTodo.id < before)
+    rows = query.order_by(ArchivedTodo.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+
+def restore(row) -> Todo:
+    """Move archived ``row`` back to ``todos`` as an active task; the caller touches and commits."""
+    todo = Todo(**{c: getattr(row, c) for c in COLUMNS if c != 'completed_at'}, completed=False)
+    db.session.add(todo)
+    db.session.delete(row)
+    db.session.flush()
+    return todo
@@ -0,0 +1,176 @@
+"""Fingerprinted, precompressed static assets.
+
+``build`` copies every file under ``static/`` (except ``dist/``) to
+``static/dist/`` with a content hash in its name, minifying CSS (and JS when
+``rjsmin`` is installed) and writing ``.gz`` and, with the ``brotli``
+package, ``.br`` siblings. A ``manifest.json`` maps original paths to the
+hashed ones; old builds are left in place so pages cached before a deploy
+keep working.
+
+With the manifest loaded, ``url_for('static', filename='css/main.css')``
+returns the hashed URL and the static view answers it with the best encoding
+the client accepts and a year-long immutable ``Cache-Control``. A front-end
+proxy can serve ``static/dist`` directly (nginx ``gzip_static``/``brotli_static``)
+so these never reach the app workers at all.
+
+Run ``flask assets build`` once per deploy (the Procfile does it before
+starting gunicorn). ``ASSETS_BUILD_ON_START=1`` builds in every process that
+creates the app instead, which is only worth it for a single local server.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+import click
+from flask import current_app, request, send_from_directory
+
+log = logging.getLogger(__name__)
+
+DIST     = 'dist'
+MANIFEST = 'manifest.json'
+MAX_AGE  = 365 * 24 * 3600
+TEXT     = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+
+# ── Minifiers ────────────────────────────────
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE   = re.compile(r'\s+')
+_CSS_PUNCT   = re.compile(r'\s*([{};,>])\s*')
+
+
+def _minify_css(text):
+    """Drop comments and redundant whitespace; leaves ``:`` alone (``a :hover`` ≠ ``a:hover``)."""
+    try:
+        import rcssmin
+        return rcssmin.cssmin(text)
+    except ImportError:
+        pass
+    text = _CSS_COMMENT.sub('', text)
+    text = _CSS_SPACE.sub(' ', text)
+    return _CSS_PUNCT.sub(r'\1', text).replace(';}', '}').strip()
+
+
+def _minify_js(text):
+    # regex-minifying JS is unsafe (strings, regex literals); only with a real minifier
+    try:
+        import rjsmin
+        return rjsmin.jsmin(text)
+    except ImportError:
+        return text
+
+
+_MINIFY = {'.css': _minify_css, '.js': _minify_js}
+
+
+# ── Build ────────────────────────────────────
+
+def _write(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp, 0o644)         # mkstemp makes it 0600; the proxy user must be able to read it
+    os.replace(tmp, path)        # atomic: workers building at once never see half a file
+
+
+def _compress(path, data):
+    _write(path + '.gz', gzip.compress(data, 9, mtime=0))
+    try:
+        import brotli
+    except ImportError:
+        return
+    _write(path + '.br', brotli.compress(data, quality=11))
+
+
+def build(static_folder) -> dict:
+    """Hash, minify and precompress every asset; returns (and writes) the manifest."""
+    dist, manifest = os.path.join(static_folder, DIST), {}
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root) == os.path.abspath(static_folder):
+            dirs[:] = [d for d in dirs if d != DIST]
+        for name in files:
+            src  = os.path.join(root, name)
+            rel  = os.path.relpath(src, static_folder).replace(os.sep, '/')
+            stem, ext = os.path.splitext(rel)
+            with open(src, 'rb') as f:
+                data = f.read()
+            if ext in _MINIFY:
+                data = _MINIFY[ext](data.decode()).encode()
+            hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+            out    = os.path.join(dist, hashed)
+            if not os.path.exists(out):
+                os.makedirs(os.path.dirname(out), exist_ok=True)
+                _write(out, data)
+                if ext in TEXT:
+                    _compress(out, data)
+            manifest[rel] = hashed
+    os.makedirs(dist, exist_ok=True)
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=1, sort_keys=True).encode())
+    return manifest
+
+
+def load(static_folder) -> dict:
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+# ── Serving ──────────────────────────────────
+
+def _fingerprint(endpoint, values):
+    manifest = current_app.extensions['assets']['manifest']
+    if endpoint == 'static' and values.get('filename') in manifest:
+        values['filename'] = f"{DIST}/{manifest[values['filename']]}"
+
+
+def _serve(app, fallback):
+    dist = os.path.join(app.static_folder, DIST)
+
+    def static(filename):
+        if not filename.startswith(DIST + '/'):
+            return fallback(filename=filename)
+        name = filename[len(DIST) + 1:]
+        path, encoding = name, None
+        for enc, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if enc in request.accept_encodings and os.path.isfile(os.path.join(dist, name + suffix)):
+                path, encoding = name + suffix, enc
+                break
+        resp = send_from_directory(dist, path, mimetype=mimetypes.guess_type(name)[0],
+                                   max_age=MAX_AGE, conditional=True)
+        if encoding:
+            resp.headers['Content-Encoding'] = encoding
+        resp.vary.add('Accept-Encoding')
+        resp.cache_control.public    = True
+        resp.cache_control.immutable = True
+        return resp
+    return static
+
+
+def init_app(app):
+    """Load (or build) the manifest and route ``static`` URLs through it."""
+    if app.config.get('ASSETS_BUILD_ON_START'):
+        manifest = build(app.static_folder)
+    else:
+        manifest = load(app.static_folder)
+    version = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:12]
+    app.extensions['assets'] = {'manifest': manifest, 'version': version}
+    if manifest:
+        app.url_defaults(_fingerprint)
+        app.view_functions['static'] = _serve(app, app.view_functions['static'])
+    elif not (app.debug or app.testing):
+        log.warning('No asset manifest in %s; serving unversioned static files', app.static_folder)
+
+    @app.cli.group('assets')
+    def assets_cli():
+        """Static asset pipeline."""
+
+    @assets_cli.command('build')
+    def build_command():
+        """Fingerprint, minify and precompress static/ into static/dist/."""
+        manifest = build(app.static_folder)
+        click.echo(f'{len(manifest)} assets → {os.path.join(app.static_folder, DIST)}')
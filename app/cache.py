@@ -0,0 +1,105 @@
+"""Small caches shared by the stats, identity and fragment layers.
+
+``TTLCache`` is per process. ``SharedCache`` wraps any redis-style client
+(``get``/``mget``/``setex``/``delete``) so several workers can share entries; see
+``make_cache``.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU map whose entries also expire ``ttl`` seconds after being set."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl     = ttl
+        self._data   = OrderedDict()
+        self._lock   = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value, expires = self._data.get(key, (_MISSING, 0))
+            if value is _MISSING:
+                return default
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        """``{key: value}`` for the keys present."""
+        found = {}
+        for key in keys:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SharedCache:
+    """JSON values on a shared key/value client, namespaced by ``prefix``."""
+
+    def __init__(self, client, prefix, ttl=300):
+        self.client = client
+        self.prefix = prefix
+        self.ttl    = ttl
+
+    def get(self, key, default=None):
+        raw = self.client.get(f'{self.prefix}:{key}')
+        return default if raw is None else json.loads(raw)
+
+    def get_many(self, keys):
+        """``{key: value}`` for the keys present, in one round trip."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        raws = self.client.mget([f'{self.prefix}:{k}' for k in keys])
+        return {k: json.loads(raw) for k, raw in zip(keys, raws) if raw is not None}
+
+    def set(self, key, value):
+        self.client.setex(f'{self.prefix}:{key}', self.ttl, json.dumps(value))
+
+    def delete(self, key):
+        self.client.delete(f'{self.prefix}:{key}')
+
+
+def make_cache(app, prefix, maxsize=1024, ttl=300):
+    """A ``SharedCache`` when ``CACHE_BACKEND`` is configured, else an in-process ``TTLCache``.
+
+    ``CACHE_BACKEND`` may be a ``redis://`` URL (needs the ``redis`` package) or
+    any client object with redis-style ``get``/``mget``/``setex``/``delete``.
+    """
+    backend = app.config.get('CACHE_BACKEND')
+    if not backend:
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    if isinstance(backend, str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError('CACHE_BACKEND is a redis URL but the redis package is not installed') from e
+        backend = app.extensions.setdefault('cache_client', redis.Redis.from_url(backend))
+    return SharedCache(backend, prefix, ttl=ttl)
@@ -0,0 +1,80 @@
+"""Per-user change versions and conditional GET for the todo views.
+
+Every route that changes a user's todos (or anything else drawn on the todo
+page) calls ``touch`` before committing, which also publishes to ``app.feed``.
+Reads look the version up with one primary-key query; ``conditional`` turns it
+into a strong ETag and answers ``304 Not Modified`` before the view renders
+anything.
+"""
+import hashlib
+import time
+from datetime import datetime, date
+from functools import wraps
+from flask import current_app, g, request, session
+from flask_login import current_user
+from app import db, feed, fragments
+from app.models import User
+
+
+def touch(user_id, *changes):
+    """Bump ``user_id``'s version in the current transaction and publish ``changes`` to the feed.
+
+    ``changes`` are ``('upsert' | 'delete', todo_id)`` pairs; none means the
+    whole list may have changed. Their cached rows are dropped. The caller commits.
+    """
+    ver = db.session.execute(db.update(User).where(User.id == user_id).values(
+        todos_version=User.todos_version + 1, todos_changed_at=datetime.utcnow()
+    ).returning(User.todos_version)).scalar()
+    g.pop('todos_version', None)
+    fragments.invalidate(*(id for _, id in changes))
+    feed.publish(user_id, ver, changes)
+    return ver
+
+
+def version(user_id):
+    """``(version, changed_at)`` for ``user_id``, looked up at most once per request."""
+    if 'todos_version' not in g:
+        row = db.session.query(User.todos_version, User.todos_changed_at).filter(User.id == user_id).first()
+        g.todos_version = tuple(row) if row else (0, None)
+    return g.todos_version
+
+
+def _csrf_epoch():
+    # pages embed a CSRF token, so a revalidated copy must not outlive it
+    limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    return int(time.time() // (limit // 2)) if limit and current_app.config.get('WTF_CSRF_ENABLED', True) else 0
+
+
+def conditional(view):
+    """Serve ``view`` with an ETag and short-circuit matching requests with a 304.
+
+    The tag covers the user's version, the request URL, today's date (for the
+    overdue filter), the user's name and email, the CSRF token lifetime and
+    the static asset build (pages link fingerprinted URLs).
+    Responses carrying flashed messages are one-off and get no validators.
+    There is no Last-Modified: a timestamp can't cover the rest of the tag,
+    so ``If-Modified-Since`` would 304 pages whose URL or token changed.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if '_flashes' in session:
+            return view(*args, **kwargs)
+
+        ver   = version(current_user.id)[0]
+        today = date.today()
+        assets = current_app.extensions.get('assets', {}).get('version', '')
+        key   = (f'{current_user.id}:{ver}:{today}:{request.full_path}:{current_user.username}:'
+                 f'{current_user.email}:{_csrf_epoch()}:{assets}')
+        etag  = hashlib.sha1(key.encode()).hexdigest()[:20]
+
+        fresh = request.if_none_match.contains(etag)
+        resp = current_app.response_class(status=304) if fresh else current_app.make_response(view(*args, **kwargs))
+        if resp.status_code not in (200, 304):
+            return resp
+
+        resp.set_etag(etag)
+        resp.cache_control.private  = True
+        resp.cache_control.no_cache = True
+        resp.vary.add('Cookie')
+        return resp
+    return wrapper
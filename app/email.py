@@ -1,9 +1,21 @@
-"""Email notifications — due reminder, overdue alert, daily digest, welcome, password changed."""
+"""Email notifications — due reminder, overdue alert, daily digest, welcome, password changed.
+
+The ``send_*`` helpers only queue a row in the outbox (see ``app.outbox``); the
+scheduler's dispatcher delivers them in batches via ``send_bulk``. Reminder and
+overdue sweeps go through ``send_reminders``/``send_overdues``, which fold a
+user's tasks into one email.
+"""
+import hashlib
 import logging
+import smtplib
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta
-from flask import current_app, render_template_string
+from flask import current_app
 from flask_mail import Message
-from app import mail
+from app import mail, metrics
+from app.outbox import enqueue
 
 log = logging.getLogger(__name__)
 
@@ -29,21 +41,87 @@ p{font-size:14px;line-height:1.6;color:#9a9590;margin:0 0 14px}
 .f a{color:#5a5550}
 """
 
-def _send(subject, to, html):
-    try:
-        mail.send(Message(subject=subject, recipients=[to], html=html,
-                          body='Please view in an HTML email client.'))
-        log.info('Email sent: %s → %s', subject, to)
-        return True
-    except Exception as e:
-        log.error('Email failed: %s → %s: %s', subject, to, e)
-        return False
+# Transient SMTP failures worth a reconnect: dropped/refused connections and 4xx replies.
+_TRANSIENT = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, socket.timeout)
+
+
+def _transient(e):
+    return isinstance(e, _TRANSIENT) or (isinstance(e, smtplib.SMTPResponseException) and 400 <= e.smtp_code < 500)
+
+
+def _message(subject, to, html):
+    return Message(subject=subject, recipients=[to], html=html,
+                   body='Please view in an HTML email client.')
+
+def _deliver(app, batch, retries):
+    """Send ``[(idx, msg), ...]`` over one SMTP connection, reconnecting on transient errors."""
+    results, attempts = {}, {}
+    pending = list(batch)
+    with app.app_context():
+        while pending:
+            try:
+                with mail.connect() as conn:
+                    while pending:
+                        i, msg = pending[0]
+                        try:
+                            conn.send(msg)
+                            results[i] = True
+                            log.info('Email sent: %s → %s', msg.subject, msg.recipients[0])
+                        except Exception as e:
+                            if _transient(e):
+                                raise
+                            results[i] = False
+                            log.error('Email failed: %s → %s: %s', msg.subject, msg.recipients[0], e)
+                        pending.pop(0)
+            except Exception as e:
+                if not pending:                      # failed while closing; everything went out
+                    break
+                if not _transient(e):                # e.g. bad credentials — no point retrying
+                    results.update((i, False) for i, _ in pending)
+                    log.error('SMTP connection failed, dropping %d messages: %s', len(pending), e)
+                    break
+                i, msg = pending[0]
+                attempts[i] = attempts.get(i, 0) + 1
+                if attempts[i] > retries:
+                    results[i] = False
+                    pending.pop(0)
+                    log.error('Email failed: %s → %s: %s', msg.subject, msg.recipients[0], e)
+                else:
+                    log.warning('SMTP error (%s), reconnecting — attempt %d/%d', e, attempts[i], retries)
+                    time.sleep(min(2 ** attempts[i], 30) * 0.1)
+    return results
+
+def send_bulk(messages) -> list:
+    """Deliver ``messages`` over a small pool of reused SMTP connections.
+
+    Returns one bool per message, in input order.
+    """
+    if not messages:
+        return []
+    app     = current_app._get_current_object()
+    workers = max(1, min(app.config.get('MAIL_POOL_SIZE', 4), len(messages)))
+    retries = app.config.get('MAIL_MAX_RETRIES', 2)
+    shards  = [list(enumerate(messages))[n::workers] for n in range(workers)]
+    results = {}
+    with metrics.timed('smtp'), ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mail') as pool:
+        for done in pool.map(lambda shard: _deliver(app, shard, retries), shards):
+            results.update(done)
+    return [results.get(i, False) for i in range(len(messages))]
 
 def _url():
     return current_app.config.get('APP_URL', 'http://localhost:5000')
 
+def _compiled(tmpl):
+    """``tmpl`` compiled once per app, with the CSS and app URL baked in as literals."""
+    app   = current_app._get_current_object()
+    cache = app.extensions.setdefault('email_templates', {})
+    if tmpl not in cache:
+        source = tmpl.replace('{{css}}', _CSS).replace('{{url}}', _url())
+        cache[tmpl] = app.jinja_env.from_string(source)
+    return cache[tmpl]
+
 def _r(tmpl, **ctx):
-    return render_template_string(tmpl, css=_CSS, url=_url(), **ctx)
+    return _compiled(tmpl).render(**ctx)
 
 
 # ── Templates ────────────────────────────────────────────────────────────────
@@ -70,13 +148,43 @@ _OVERDUE = """<!DOCTYPE html><html><head><style>{{css}}</style></head><body><div
 <div class="f"><p>DOZO · <a href="{{url}}/auth/settings">Manage notifications</a></p></div>
 </div></div></body></html>"""
 
-_DIGEST = """<!DOCTYPE html><html><head><style>{{css}}
+# Task-list layout shared by the digest and the coalesced reminder/overdue emails.
+_LIST_CSS = """
 .sec{font-size:10px;text-transform:uppercase;letter-spacing:.1em;color:#5a5550;font-family:monospace;margin:20px 0 6px}
 ul{margin:0;padding:0;list-style:none}
 li{padding:8px 0;border-bottom:1px solid #1c1c1c;font-size:13px;color:#9a9590}
 li:last-child{border:none}
 .t{color:#e8e6e0;font-weight:500}
-</style></head><body><div class="w"><div class="c">
+.d{float:right;font-family:monospace;font-size:11px;color:#5a5550}
+"""
+
+_REMINDERS = """<!DOCTYPE html><html><head><style>{{css}}""" + _LIST_CSS + """</style></head><body><div class="w"><div class="c">
+<div class="h"><span class="logo">DZ DOZO</span></div>
+<div class="b">
+  <h1>⏰ {{tasks|length}} tasks due soon</h1>
+  <p>Hey <strong style="color:#e8e6e0">{{user}}</strong>, these are coming up:</p>
+  <ul>{% for t in tasks %}<li><span class="t">{{t.title}}</span>{% if t.priority == 'high' %} ▲{% endif %}
+    <span class="d">{{t.due_date.strftime('%b %d')}}{% if t.due_time %} {{t.due_time.strftime('%H:%M')}}{% endif %}</span>
+  </li>{% endfor %}</ul>
+  <a href="{{url}}/todos/" class="btn" style="margin-top:20px">Open Tasks →</a>
+</div>
+<div class="f"><p>DOZO · <a href="{{url}}/auth/settings">Manage notifications</a></p></div>
+</div></div></body></html>"""
+
+_OVERDUES = """<!DOCTYPE html><html><head><style>{{css}}""" + _LIST_CSS + """</style></head><body><div class="w"><div class="c">
+<div class="h"><span class="logo">DZ DOZO</span></div>
+<div class="b">
+  <h1>⚠ {{tasks|length}} tasks overdue</h1>
+  <p>Hey <strong style="color:#e8e6e0">{{user}}</strong>, these passed their due date:</p>
+  <ul>{% for t in tasks %}<li><span class="t">{{t.title}}</span>
+    <span class="d">WAS DUE {{t.due_date.strftime('%b %d')}}</span>
+  </li>{% endfor %}</ul>
+  <a href="{{url}}/todos/?filter=overdue" class="btn" style="margin-top:20px">Go to Tasks →</a>
+</div>
+<div class="f"><p>DOZO · <a href="{{url}}/auth/settings">Manage notifications</a></p></div>
+</div></div></body></html>"""
+
+_DIGEST = """<!DOCTYPE html><html><head><style>{{css}}""" + _LIST_CSS + """</style></head><body><div class="w"><div class="c">
 <div class="h"><span class="logo">DZ DOZO</span></div>
 <div class="b">
   <h1>☀ Good morning, {{user}}</h1>
@@ -87,7 +195,7 @@ li:last-child{border:none}
   <ul>{% for t in due_today %}<li><span class="t">{{t.title}}</span></li>{% endfor %}</ul>{% endif %}
   {% if upcoming %}<p class="sec">→ Upcoming ({{upcoming|length}})</p>
   <ul>{% for t in upcoming %}<li><span class="t">{{t.title}}</span>
-    <span style="float:right;font-family:monospace;font-size:11px;color:#5a5550">{{t.due_date.strftime('%b %d')}}</span>
+    <span class="d">{{t.due_date.strftime('%b %d')}}</span>
   </li>{% endfor %}</ul>{% endif %}
   {% if not overdue and not due_today and not upcoming %}<p style="color:#5a5550;font-style:italic">No pending tasks — enjoy your clear day ✓</p>{% endif %}
   <a href="{{url}}/todos/" class="btn" style="margin-top:20px">Open Tasks →</a>
@@ -124,30 +232,61 @@ def send_reminder(user, task) -> bool:
     if not user.notify_reminder:
         return False
     due = task.due_date.strftime('%B %d') + (f' at {task.due_time.strftime("%H:%M")}' if task.due_time else '')
-    return _send(f'⏰ "{task.title}" is due soon', user.email,
-                 _r(_REMINDER, user=user.username, title=task.title, due=due, priority=task.priority))
+    return enqueue(f'reminder:{task.id}:{task.due_date}:{task.due_time}', user.email,
+                   f'⏰ "{task.title}" is due soon',
+                   _r(_REMINDER, user=user.username, title=task.title, due=due, priority=task.priority))
 
 
 def send_overdue(user, task) -> bool:
     if not user.notify_overdue:
         return False
-    return _send(f'⚠ Overdue: "{task.title}"', user.email,
-                 _r(_OVERDUE, user=user.username, title=task.title,
-                    due=task.due_date.strftime('%B %d')))
+    return enqueue(f'overdue:{task.id}:{task.due_date}', user.email, f'⚠ Overdue: "{task.title}"',
+                   _r(_OVERDUE, user=user.username, title=task.title,
+                      due=task.due_date.strftime('%B %d')))
+
+
+def _batch_key(kind, user, tasks, part):
+    """Dedupe key for a multi-task email: the same tasks in the same state give the same key."""
+    digest = hashlib.sha1('|'.join(sorted(part(t) for t in tasks)).encode()).hexdigest()[:16]
+    return f'{kind}:{user.id}:{digest}'
+
+
+def send_reminders(user, tasks) -> bool:
+    """One reminder for all of ``user``'s ``tasks`` coming due in this sweep."""
+    if len(tasks) == 1:
+        return send_reminder(user, tasks[0])
+    if not user.notify_reminder or not tasks:
+        return False
+    key = _batch_key('reminders', user, tasks, lambda t: f'{t.id}:{t.due_date}:{t.due_time}')
+    return enqueue(key, user.email, f'⏰ {len(tasks)} tasks are due soon',
+                   _r(_REMINDERS, user=user.username, tasks=tasks))
+
+
+def send_overdues(user, tasks) -> bool:
+    """One overdue alert for all of ``user``'s ``tasks`` that went overdue since the last sweep."""
+    if len(tasks) == 1:
+        return send_overdue(user, tasks[0])
+    if not user.notify_overdue or not tasks:
+        return False
+    key = _batch_key('overdues', user, tasks, lambda t: f'{t.id}:{t.due_date}')
+    return enqueue(key, user.email, f'⚠ {len(tasks)} tasks are overdue',
+                   _r(_OVERDUES, user=user.username, tasks=tasks))
 
 
 def send_digest(user, overdue, due_today, upcoming) -> bool:
     if not user.notify_digest or (not overdue and not due_today and not upcoming):
         return False
-    return _send(f'☀ DOZO Daily — {date.today().strftime("%b %d")}', user.email,
-                 _r(_DIGEST, user=user.username, today=date.today().strftime('%A, %B %d'),
-                    overdue=overdue, due_today=due_today, upcoming=upcoming))
+    return enqueue(f'digest:{user.id}:{date.today()}', user.email,
+                   f'☀ DOZO Daily — {date.today().strftime("%b %d")}',
+                   _r(_DIGEST, user=user.username, today=date.today().strftime('%A, %B %d'),
+                      overdue=overdue, due_today=due_today, upcoming=upcoming))
 
 
 def send_welcome(user) -> bool:
-    return _send('Welcome to DOZO 👋', user.email, _r(_WELCOME, user=user.username))
+    return enqueue(f'welcome:{user.id}', user.email, 'Welcome to DOZO 👋', _r(_WELCOME, user=user.username))
 
 
 def send_pw_changed(user) -> bool:
-    return _send('🔐 Your DOZO password was changed', user.email,
-                 _r(_PW_CHANGED, user=user.username, ts=datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')))
\ No newline at end of file
+    ts = datetime.utcnow()
+    return enqueue(f'pw_changed:{user.id}:{ts.isoformat()}', user.email, '🔐 Your DOZO password was changed',
+                   _r(_PW_CHANGED, user=user.username, ts=ts.strftime('%Y-%m-%d %H:%M UTC')))
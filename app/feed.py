@@ -0,0 +1,189 @@
+"""Per-user change feed for open tabs (served as Server-Sent Events).
+
+``app.changes.touch`` publishes one event per committed change:
+``{"user": id, "version": n, "changes": [{"op": "upsert"|"delete", "id": todo_id}, ...]}``.
+An empty ``changes`` list means "reload the list" (bulk edits, imports, profile).
+
+Streams are only offered by processes that can hold many connections open
+cheaply: gevent workers (the ``web`` process in the Procfile), or any process
+with ``FEED_ENABLED`` set. Elsewhere ``/todos/events`` answers 204 and the
+page doesn't open an ``EventSource``, so tabs never pin a sync worker.
+
+On Postgres the event goes out with ``pg_notify`` inside the writer's
+transaction, so it is delivered only if the change commits, and to every
+process. Each process that serves the feed runs one ``LISTEN`` thread and fans
+events out to its local subscribers. On other databases events are held on
+the session and handed to the in-process broker after commit, which only
+reaches tabs connected to the same process.
+"""
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+
+log = logging.getLogger(__name__)
+
+CHANNEL = 'todo_changes'
+RELOAD  = {'changes': []}
+
+
+class Broker:
+    """Fan-out of events to per-connection queues, keyed by user id."""
+
+    def __init__(self, backlog=100):
+        self.backlog = backlog
+        self._subs   = defaultdict(set)
+        self._taps   = []
+        self._lock   = threading.Lock()
+
+    def tap(self, fn):
+        """Also call ``fn(evt)`` for every user's events (e.g. the reminder queue); must not block."""
+        with self._lock:
+            if fn not in self._taps:
+                self._taps.append(fn)
+
+    def subscribe(self, user_id):
+        q = queue.Queue(self.backlog)
+        with self._lock:
+            self._subs[user_id].add(q)
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            self._subs[user_id].discard(q)
+            if not self._subs[user_id]:
+                del self._subs[user_id]
+
+    def publish(self, evt):
+        with self._lock:
+            subs, taps = list(self._subs.get(evt['user'], ())), list(self._taps)
+        for fn in taps:
+            try:
+                fn(evt)
+            except Exception:
+                log.exception('feed: tap %r failed', fn)
+        for q in subs:
+            try:
+                q.put_nowait(evt)
+            except queue.Full:
+                # a stalled client: drop what it missed and tell it to reload
+                with q.mutex:
+                    q.queue.clear()
+                q.put_nowait(dict(RELOAD, user=evt['user'], version=evt['version']))
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(s) for s in self._subs.values())
+
+
+broker = Broker()
+
+
+def available() -> bool:
+    """True when this process should serve streams: ``FEED_ENABLED``, else only under gevent."""
+    enabled = current_app.config.get('FEED_ENABLED')
+    if enabled is not None:
+        return bool(enabled)
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+
+# ── Publishing ───────────────────────────────
+
+def publish(user_id, version, changes=()):
+    """Queue an event for ``user_id``; it is delivered only if the current transaction commits."""
+    evt = {'user': user_id, 'version': version, 'changes': [{'op': op, 'id': id} for op, id in changes]}
+    if db.session.get_bind().dialect.name == 'postgresql':
+        payload = json.dumps(evt)
+        if len(payload) >= 8000:                    # NOTIFY payload limit
+            payload = json.dumps(dict(evt, changes=[]))
+        db.session.execute(db.select(db.func.pg_notify(CHANNEL, payload)))
+    else:
+        db.session.info.setdefault('feed', []).append(evt)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    for evt in session.info.pop('feed', ()):
+        broker.publish(evt)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('feed', None)
+
+
+# ── Postgres listener ────────────────────────
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _listen(engine):
+    while True:
+        try:
+            raw = engine.raw_connection()
+            try:
+                conn = raw.driver_connection
+                conn.autocommit = True
+                conn.cursor().execute(f'LISTEN {CHANNEL}')
+                log.info('feed: listening on %s', CHANNEL)
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        broker.publish(json.loads(conn.notifies.pop(0).payload))
+            finally:
+                raw.invalidate()
+        except Exception:
+            log.exception('feed: listener failed; reconnecting')
+            time.sleep(5)
+
+
+def ensure_listener():
+    """Start this process's LISTEN thread (Postgres only) the first time a client connects."""
+    global _listener
+    engine = db.engine
+    if engine.dialect.name != 'postgresql':
+        return
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = threading.Thread(target=_listen, args=(engine,), name='feed-listener', daemon=True)
+            _listener.start()
+
+
+# ── SSE stream ───────────────────────────────
+
+def stream(user_id, last_version, current_version, heartbeat=15):
+    """SSE lines for ``user_id`` until the client goes away.
+
+    A client reconnecting with an older ``Last-Event-ID`` than the current
+    version missed events while offline, so it is told to reload first.
+    """
+    q = broker.subscribe(user_id)
+    try:
+        yield 'retry: 3000\n\n'
+        if last_version is not None and last_version < current_version:
+            yield _format(dict(RELOAD, user=user_id, version=current_version))
+        while True:
+            try:
+                yield _format(q.get(timeout=heartbeat))
+            except queue.Empty:
+                yield ': ping\n\n'
+    finally:
+        broker.unsubscribe(user_id, q)
+
+
+def _format(evt):
+    return f"id: {evt['version']}\nevent: change\ndata: {json.dumps(evt)}\n\n"
@@ -0,0 +1,76 @@
+"""Cached HTML for task rows (``_task_row.html``).
+
+Each row is rendered once per *row version* and reused across requests and
+users' page loads. Todos carry no version column (and bulk ``UPDATE``s would
+skip one anyway), so the version is the row's rendered fields, including
+whether it is overdue today; a cached entry whose stamp differs is simply
+re-rendered. Per-request values stay out of the cached HTML as placeholders:
+the CSRF hidden tag and the row's position (``--idx``) are filled in when the
+list is assembled.
+
+The cache is per process unless ``CACHE_BACKEND`` is set (``app.cache``).
+``app.changes.touch`` drops the rows a change names.
+"""
+from markupsafe import Markup
+from flask import current_app
+from app import metrics
+from app.cache import make_cache
+
+ROW_TEMPLATE = '_task_row.html'
+_CSRF = '\x00csrf\x00'
+_IDX  = '\x00idx\x00'
+
+
+class _FormStub:
+    """Stands in for the form while rendering a row for the cache."""
+
+    @staticmethod
+    def hidden_tag():
+        return Markup(_CSRF)
+
+
+def _cache():
+    app = current_app._get_current_object()
+    if 'row_cache' not in app.extensions:
+        app.extensions['row_cache'] = make_cache(app, 'rows', maxsize=app.config.get('ROW_CACHE_SIZE', 20_000),
+                                                 ttl=app.config.get('ROW_CACHE_SECS', 3600))
+    return app.extensions['row_cache']
+
+
+def _stamp(todo, today):
+    overdue = todo.due_date is not None and todo.due_date < today
+    created = todo.created_at.date() if todo.created_at else None
+    return f'{todo.completed:d}{overdue:d}|{todo.priority}|{todo.due_date}|{todo.due_time}|{created}|{todo.title}'
+
+
+def render_rows(todos, form, today) -> Markup:
+    """The rows for ``todos``, from cache where their stamp still matches."""
+    cache  = _cache()
+    cached = cache.get_many(t.id for t in todos)
+    tmpl   = None
+    parts  = []
+    # ``tmpl.render`` fires no template signals, so time it here (metrics skips it inside a page render)
+    with metrics.timed('render'):
+        for todo in todos:
+            stamp = _stamp(todo, today)
+            hit   = cached.get(todo.id)
+            if hit and hit[0] == stamp:
+                html = hit[1]
+            else:
+                tmpl = tmpl or current_app.jinja_env.get_template(ROW_TEMPLATE)
+                html = tmpl.render(todo=todo, idx=Markup(_IDX), form=_FormStub, today=today)
+                cache.set(todo.id, [stamp, html])
+            parts.append(html)
+
+        csrf = str(form.hidden_tag())
+        return Markup(''.join(html.replace(_CSRF, csrf).replace(_IDX, str(i)) for i, html in enumerate(parts)))
+
+
+def invalidate(*ids):
+    cache = _cache()
+    for id in ids:
+        cache.delete(id)
+
+
+def init_app(app):
+    app.add_template_global(render_rows, 'task_rows')
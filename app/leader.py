@@ -0,0 +1,115 @@
+"""Cluster-wide scheduler leadership via a lease row with heartbeat and fencing tokens.
+
+Every process runs the scheduler, but only the lease holder executes sweeps.
+A takeover bumps ``token``; work started under an older token checks it in
+the same transaction as its writes and refuses to commit (see ``check``).
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import SchedulerLease
+
+log = logging.getLogger(__name__)
+
+NAME     = 'scheduler'
+IDENTITY = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+_lock  = threading.Lock()
+_token = None          # fencing token while we hold the lease
+_until = 0.0           # monotonic deadline (short of the DB expiry) after which we stop trusting it
+
+
+class LeaseLost(RuntimeError):
+    pass
+
+
+def _ttl():
+    return current_app.config.get('LEADER_LEASE_SECS', 30)
+
+
+def _ensure_row():
+    if db.session.get(SchedulerLease, NAME) is None:
+        try:
+            db.session.add(SchedulerLease(name=NAME, token=0))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()          # another process created it first
+
+
+def heartbeat() -> bool:
+    """Renew our lease or try to take over an expired one. Needs an app context."""
+    global _token, _until
+    ttl, now = _ttl(), datetime.utcnow()
+    q = SchedulerLease.query.filter_by(name=NAME)
+    with _lock:
+        try:
+            if _token is not None and q.filter_by(holder=IDENTITY, token=_token)\
+                                       .update({'expires_at': now + timedelta(seconds=ttl)}):
+                db.session.commit()
+                _until = time.monotonic() + ttl * 0.8
+                return True
+
+            _ensure_row()
+            taken = q.filter(db.or_(SchedulerLease.expires_at.is_(None), SchedulerLease.expires_at < now))\
+                     .update({'holder': IDENTITY, 'token': SchedulerLease.token + 1,
+                              'expires_at': now + timedelta(seconds=ttl)}, synchronize_session=False)
+            if taken:
+                _token = db.session.query(SchedulerLease.token).filter_by(name=NAME).scalar()
+                db.session.commit()
+                _until = time.monotonic() + ttl * 0.8
+                log.info('Scheduler leadership acquired by %s (token %d)', IDENTITY, _token)
+                return True
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            log.warning('Lease heartbeat failed: %s', e)
+
+        if _token is not None:
+            log.warning('Scheduler leadership lost by %s (token %d)', IDENTITY, _token)
+        _token, _until = None, 0.0
+        return False
+
+
+def is_leader() -> bool:
+    return _token is not None and time.monotonic() < _until
+
+
+def token():
+    return _token if is_leader() else None
+
+
+def check(expected):
+    """Fence the current transaction: raise ``LeaseLost`` unless ``expected`` is still our token.
+
+    A no-op ``UPDATE`` of the lease row guarded by token and holder, so the
+    row stays locked until the caller commits: a takeover (which bumps the
+    token) waits for our writes to land, or lands first and makes this
+    match nothing. Call it in the same transaction as the writes, just
+    before committing; roll back on ``LeaseLost``.
+    """
+    matched = expected is not None and SchedulerLease.query\
+        .filter_by(name=NAME, token=expected, holder=IDENTITY)\
+        .update({'token': SchedulerLease.token}, synchronize_session=False)
+    if matched != 1:
+        raise LeaseLost(f'fencing token {expected} is no longer held by {IDENTITY}')
+
+
+def release():
+    """Give up the lease so a standby can take over on its next heartbeat."""
+    global _token, _until
+    with _lock:
+        if _token is None:
+            return
+        try:
+            SchedulerLease.query.filter_by(name=NAME, holder=IDENTITY, token=_token)\
+                                .update({'expires_at': datetime.utcnow()})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+        _token, _until = None, 0.0
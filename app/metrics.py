@@ -0,0 +1,309 @@
+"""Opt-in instrumentation: per-endpoint and per-job SQL count/time, template and SMTP time.
+
+Turned on with ``METRICS_ENABLED``. When it is off, ``init_app`` registers no
+listeners and ``instrument`` returns jobs unwrapped, so requests pay nothing.
+
+Totals are kept per process and served in Prometheus text format at
+``/metrics``; ``/metrics/profile?seconds=N`` samples every thread's stack for
+N seconds and returns collapsed stacks (input for flamegraph.pl/speedscope).
+The profiler needs sync workers: under gevent every greenlet shares the hub
+thread, and the sampler (itself a greenlet) only ever sees its own frame, so
+it answers 501 there; profile a sync worker (``--worker-class sync``) instead.
+Both need ``Authorization: Bearer $METRICS_TOKEN``, or a loopback client when
+no token is configured.
+"""
+import contextvars
+import hmac
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import partial, wraps
+from flask import Blueprint, Response, abort, current_app, g, request
+from flask.signals import request_started, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+FIELDS = ('queries', 'db', 'render', 'smtp')
+
+_current = contextvars.ContextVar('metrics_scope', default=None)
+
+
+class Scope:
+    """Counters for one request or job run; shared with threads it hands work to."""
+
+    def __init__(self, kind, name):
+        self.kind, self.name = kind, name
+        self.start   = time.perf_counter()
+        self.renders = []
+        self.totals  = dict.fromkeys(FIELDS, 0)
+        self._lock   = threading.Lock()
+
+    def add(self, field, value):
+        with self._lock:
+            self.totals[field] += value
+
+
+class Registry:
+    """Running totals per ``(kind, name)``."""
+
+    def __init__(self):
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def record(self, s, failed=False):
+        elapsed = time.perf_counter() - s.start
+        with self._lock:
+            row = self._rows.setdefault((s.kind, s.name), dict(calls=0, errors=0, seconds=0.0, max_queries=0,
+                                                               **dict.fromkeys(FIELDS, 0)))
+            row['calls']      += 1
+            row['errors']     += failed
+            row['seconds']    += elapsed
+            row['max_queries'] = max(row['max_queries'], s.totals['queries'])
+            for f in FIELDS:
+                row[f] += s.totals[f]
+
+    def snapshot(self):
+        with self._lock:
+            return {k: dict(v) for k, v in self._rows.items()}
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+registry = Registry()
+
+# (metric, row key, type, help)
+_SERIES = [
+    ('dozo_calls_total',          'calls',       'counter', 'Requests served / job runs.'),
+    ('dozo_errors_total',         'errors',      'counter', 'Requests or job runs that raised.'),
+    ('dozo_seconds_total',        'seconds',     'counter', 'Wall time.'),
+    ('dozo_db_queries_total',     'queries',     'counter', 'SQL statements executed.'),
+    ('dozo_db_queries_max',       'max_queries', 'gauge',   'Most SQL statements in a single call.'),
+    ('dozo_db_seconds_total',     'db',          'counter', 'Time inside SQL statements.'),
+    ('dozo_render_seconds_total', 'render',      'counter', 'Time rendering templates.'),
+    ('dozo_smtp_seconds_total',   'smtp',        'counter', 'Time sending mail.'),
+]
+
+
+def render_text():
+    """All totals, plus the digest and password-pool gauges, in Prometheus exposition format."""
+    rows, out = registry.snapshot(), []
+    for metric, key, kind, help_ in _SERIES:
+        out += [f'# HELP {metric} {help_}', f'# TYPE {metric} {kind}']
+        out += [f'{metric}{{kind="{k}",name="{_esc(n)}"}} {row[key]:g}' for (k, n), row in sorted(rows.items())]
+
+    from app import passwords
+    from app.scheduler import digest_progress
+    for key, value in sorted(passwords.stats().items()):
+        out.append(f'dozo_password_{key} {value:g}')
+    for key in ('users_total', 'users_done', 'queued', 'pages', 'duration'):
+        out.append(f'dozo_digest_{key} {digest_progress[key] or 0:g}')
+    return '\n'.join(out) + '\n'
+
+
+def _esc(v):
+    return str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# ── Scopes ───────────────────────────────────
+
+def _finish(s, failed, limit):
+    registry.record(s, failed)
+    if s.totals['queries'] > limit:
+        log.warning('%s %s ran %d queries (%.1fms in SQL) — N+1?', s.kind, s.name,
+                    s.totals['queries'], s.totals['db'] * 1000)
+
+
+@contextmanager
+def scope(kind, name, warn_queries=30):
+    s, failed = Scope(kind, name), False
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        _current.reset(token)
+        _finish(s, failed, warn_queries)
+
+
+@contextmanager
+def timed(field):
+    """Add the block's duration to ``field`` of the current scope, if there is one.
+
+    ``render`` blocks share the template signals' stack, so rendering that
+    happens inside a page template is not counted twice.
+    """
+    s = _current.get()
+    if s is None:
+        yield
+        return
+    if field == 'render':
+        _before_render(None, None, None)
+        try:
+            yield
+        finally:
+            _rendered(None, None, None)
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        s.add(field, time.perf_counter() - t0)
+
+
+def bound(fn):
+    """``fn`` tied to the caller's scope, for handing to a thread pool (call once per task)."""
+    return partial(contextvars.copy_context().run, fn)
+
+
+def instrument(app, name, fn):
+    """``fn`` wrapped to record a ``job`` scope named ``name``; ``fn`` itself when metrics are off."""
+    if not app.config.get('METRICS_ENABLED'):
+        return fn
+
+    warn = app.config.get('METRICS_QUERY_WARN', 30)
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with scope('job', name, warn):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+# ── Hooks ────────────────────────────────────
+
+def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault('metrics_t0', []).append(time.perf_counter())
+
+
+def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+    s = _current.get()
+    if s is not None and conn.info.get('metrics_t0'):
+        s.add('db', time.perf_counter() - conn.info['metrics_t0'].pop())
+        s.add('queries', 1)
+
+
+def _on_error(ctx):
+    if ctx.connection is not None and ctx.connection.info.get('metrics_t0'):
+        ctx.connection.info['metrics_t0'].pop()
+
+
+def _request_started(app, **_):
+    g._metrics = Scope('request', request.endpoint or 'unmatched')
+    g._metrics_token = _current.set(g._metrics)
+
+
+def _teardown(exc):
+    s = g.pop('_metrics', None)
+    if s is not None:
+        _current.reset(g.pop('_metrics_token'))
+        _finish(s, exc is not None, current_app.config.get('METRICS_QUERY_WARN', 30))
+
+
+def _before_render(app, template, context, **_):
+    s = _current.get()
+    if s is not None:
+        s.renders.append(time.perf_counter())
+
+
+def _rendered(app, template, context, **_):
+    s = _current.get()
+    if s is not None and s.renders:
+        t0 = s.renders.pop()
+        if not s.renders:                   # nested renders are inside the outer one's time
+            s.add('render', time.perf_counter() - t0)
+
+
+_hooked = False
+
+
+def init_app(app):
+    """Register the hooks and ``/metrics`` endpoints when ``METRICS_ENABLED`` is set."""
+    global _hooked
+    if not app.config.get('METRICS_ENABLED'):
+        return
+    if not _hooked:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor)
+        event.listen(Engine, 'after_cursor_execute',  _after_cursor)
+        event.listen(Engine, 'handle_error',          _on_error)
+        _hooked = True
+    request_started.connect(_request_started, app)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    app.teardown_request(_teardown)
+    app.register_blueprint(metrics_bp, url_prefix='/metrics')
+
+
+# ── Endpoints ────────────────────────────────
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.before_request
+def _authorize():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(403)
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        abort(403)
+
+
+@metrics_bp.route('')
+def metrics():
+    return Response(render_text(), mimetype='text/plain; version=0.0.4')
+
+
+_profiling = threading.Lock()
+
+
+def sample(seconds, interval=0.005):
+    """Collapsed stacks of every other thread, sampled every ``interval`` for ``seconds``."""
+    me, names, stacks = threading.get_ident(), {}, Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names.update((t.ident, t.name) for t in threading.enumerate())
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                parts.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                frame = frame.f_back
+            stacks[';'.join([names.get(ident, str(ident))] + parts[::-1])] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def _green():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+
+@metrics_bp.route('/profile')
+def profile():
+    if _green():
+        return Response('profiling needs a sync worker: under gevent every request runs on one thread\n',
+                        501, mimetype='text/plain')
+    seconds = min(max(request.args.get('seconds', 5, type=float), 0.1), 60)
+    if not _profiling.acquire(blocking=False):
+        abort(409)
+    try:
+        stacks = sample(seconds)
+    finally:
+        _profiling.release()
+    body = ''.join(f'{stack} {n}\n' for stack, n in stacks.most_common())
+    return Response(body, mimetype='text/plain')
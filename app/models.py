@@ -1,10 +1,55 @@
-from datetime import datetime, date
+import sqlite3
+from datetime import datetime, date, time
+from flask import current_app
 from flask_login import UserMixin
-from app import db, login, bcrypt
+from sqlalchemy.engine import Engine
+from app import db, login, passwords
+from app.cache import make_cache
+
+
+@db.event.listens_for(Engine, 'connect')
+def _sqlite_foreign_keys(dbapi_conn, _):
+    # SQLite ignores ON DELETE CASCADE unless each connection switches foreign keys on
+    if isinstance(dbapi_conn, sqlite3.Connection):
+        dbapi_conn.execute('PRAGMA foreign_keys = ON')
+
+
+class Identity(UserMixin):
+    """What Flask-Login keeps as ``current_user``: just the columns pages need.
+
+    Routes that change the account load the full ``User`` row themselves.
+    """
+    FIELDS = ('id', 'username', 'email')
+
+    def __init__(self, data):
+        self.id, self.username, self.email = (data[f] for f in self.FIELDS)
+
+
+def _identities():
+    app = current_app._get_current_object()
+    if 'identity_cache' not in app.extensions:
+        app.extensions['identity_cache'] = make_cache(app, 'identity', maxsize=10_000,
+                                                      ttl=app.config.get('IDENTITY_CACHE_SECS', 60))
+    return app.extensions['identity_cache']
 
 
 @login.user_loader
-def load_user(uid): return User.query.get(int(uid))
+def load_user(uid):
+    cache = _identities()
+    data  = cache.get(int(uid))
+    if data is None:
+        row = db.session.query(*(getattr(User, f) for f in Identity.FIELDS))\
+                        .filter(User.id == int(uid), User.deleted_at.is_(None)).first()
+        if row is None:
+            return None
+        data = row._asdict()
+        cache.set(int(uid), data)
+    return Identity(data)
+
+
+def forget_user(uid):
+    """Drop ``uid`` from the identity cache after its row changed or was deleted."""
+    _identities().delete(int(uid))
 
 
 class User(UserMixin, db.Model):
@@ -16,15 +61,23 @@ class User(UserMixin, db.Model):
     bio             = db.Column(db.Text)
     created_at      = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # bumped by app.changes.touch on every change to the user's todos (ETags, change feed)
+    todos_version    = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    todos_changed_at = db.Column(db.DateTime)
+
     # notification prefs
     notify_reminder = db.Column(db.Boolean, default=True)
     notify_overdue  = db.Column(db.Boolean, default=True)
     notify_digest   = db.Column(db.Boolean, default=False)
 
-    todos = db.relationship('Todo', backref='owner', lazy='dynamic', cascade='all, delete-orphan')
+    deleted_at      = db.Column(db.DateTime)            # set while app.purge removes a large account
+
+    # the FK cascades, so deleting a user never loads its todos
+    todos = db.relationship('Todo', backref='owner', lazy='dynamic', cascade='all, delete-orphan',
+                            passive_deletes=True)
 
-    def set_password(self, pw):   self.password_hash = bcrypt.generate_password_hash(pw).decode()
-    def check_password(self, pw): return bcrypt.check_password_hash(self.password_hash, pw)
+    def set_password(self, pw):   self.password_hash = passwords.hash_password(pw)
+    def check_password(self, pw): return passwords.check_password(self.password_hash, pw)
 
 
 class Todo(db.Model):
@@ -35,12 +88,45 @@ class Todo(db.Model):
     priority      = db.Column(db.String(16), default='normal', nullable=False)
     due_date      = db.Column(db.Date)
     due_time      = db.Column(db.Time)
-    created_at    = db.Column(db.DateTime, default=datetime.utcnow)
-    user_id       = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at    = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    user_id       = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
 
     reminder_sent = db.Column(db.Boolean, default=False)
     overdue_sent  = db.Column(db.Boolean, default=False)
 
+    # due_date + due_time (midnight when untimed), kept in sync by _sync_due_at
+    due_at        = db.Column(db.DateTime)
+    # set while completed (_sync_completed_at); app.archive moves old completed rows out
+    completed_at  = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_todos_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_todos_user_completed', 'user_id', 'completed'),
+        # partial-index predicates are spelled the way SQLAlchemy renders ``~Todo.completed``
+        # on each dialect, so the planners can match them against the hot queries
+        db.Index('ix_todos_user_open_due', 'user_id', 'due_date',
+                 postgresql_where=db.text('NOT completed'), sqlite_where=db.text('completed = 0')),
+        db.Index('ix_todos_reminder_pending', 'due_at',
+                 postgresql_where=db.text('NOT completed AND NOT reminder_sent'),
+                 sqlite_where=db.text('completed = 0 AND reminder_sent = 0')),
+        db.Index('ix_todos_overdue_pending', 'due_at',
+                 postgresql_where=db.text('NOT completed AND NOT overdue_sent'),
+                 sqlite_where=db.text('completed = 0 AND overdue_sent = 0')),
+        # the sweeps' keyset order (scheduler._user_batches), so each batch resumes
+        # from the last (user_id, id) instead of re-sorting every pending row
+        db.Index('ix_todos_reminder_pending_user', 'user_id', 'id',
+                 postgresql_where=db.text('NOT completed AND NOT reminder_sent'),
+                 sqlite_where=db.text('completed = 0 AND reminder_sent = 0')),
+        db.Index('ix_todos_overdue_pending_user', 'user_id', 'id',
+                 postgresql_where=db.text('NOT completed AND NOT overdue_sent'),
+                 sqlite_where=db.text('completed = 0 AND overdue_sent = 0')),
+        db.Index('ix_todos_completed_at', 'completed_at',
+                 postgresql_where=db.text('completed'), sqlite_where=db.text('completed = 1')),
+        # title search (app.search); SQLite uses an FTS5 table instead
+        db.Index('ix_todos_title_tsv', db.text("to_tsvector('simple', title)"),
+                 postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
+
     @property
     def is_overdue(self):
         return not self.completed and self.due_date is not None and self.due_date < date.today()
@@ -54,4 +140,74 @@ class Todo(db.Model):
             'id': self.id, 'title': self.title,
             'completed': self.completed, 'priority': self.priority,
             'due_date': self.due_date.isoformat() if self.due_date else None,
-        }
\ No newline at end of file
+        }
+
+
+def due_at(due_date, due_time):
+    return datetime.combine(due_date, due_time or time.min) if due_date else None
+
+
+@db.event.listens_for(Todo, 'before_insert')
+@db.event.listens_for(Todo, 'before_update')
+def _sync_due_at(mapper, conn, todo):
+    todo.due_at = due_at(todo.due_date, todo.due_time)
+
+
+@db.event.listens_for(Todo, 'before_insert')
+@db.event.listens_for(Todo, 'before_update')
+def _sync_completed_at(mapper, conn, todo):
+    if not todo.completed:
+        todo.completed_at = None
+    elif todo.completed_at is None:
+        todo.completed_at = datetime.utcnow()
+
+
+class ArchivedTodo(db.Model):
+    """A completed todo moved out of ``todos`` by ``app.archive``; un-completing it moves it back."""
+    __tablename__ = 'todos_archive'
+    id            = db.Column(db.Integer, primary_key=True)
+    todo_id       = db.Column(db.Integer, nullable=False)      # its id in ``todos`` (not reserved there)
+    title         = db.Column(db.String(256), nullable=False)
+    priority      = db.Column(db.String(16), default='normal', nullable=False)
+    due_date      = db.Column(db.Date)
+    due_time      = db.Column(db.Time)
+    created_at    = db.Column(db.DateTime, nullable=False)
+    completed_at  = db.Column(db.DateTime)
+    archived_at   = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    user_id       = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+
+    __table_args__ = (db.Index('ix_todos_archive_user', 'user_id', 'id'),)
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'title': self.title, 'priority': self.priority,
+            'due_date': self.due_date.isoformat() if self.due_date else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'archived_at': self.archived_at.isoformat(),
+        }
+
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    id              = db.Column(db.Integer, primary_key=True)
+    key             = db.Column(db.String(128), unique=True, nullable=False)   # idempotency key
+    recipient       = db.Column(db.String(120), nullable=False)
+    subject         = db.Column(db.String(256), nullable=False)
+    html            = db.Column(db.Text, nullable=False)
+    created_at      = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # delivery state: pending → sending → sent | pending (retry) | dead
+    status          = db.Column(db.String(16), default='pending', nullable=False)
+    attempts        = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claim           = db.Column(db.String(32), index=True)
+    sent_at         = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index('ix_email_outbox_due', 'status', 'next_attempt_at'),)
+
+
+class SchedulerLease(db.Model):
+    __tablename__ = 'scheduler_lease'
+    name       = db.Column(db.String(32), primary_key=True)
+    holder     = db.Column(db.String(128))
+    token      = db.Column(db.Integer, default=0, nullable=False)   # fencing token, bumped on every takeover
+    expires_at = db.Column(db.DateTime)
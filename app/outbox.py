@@ -0,0 +1,89 @@
+"""Transactional email outbox — callers insert rows, the scheduler drains them."""
+import logging
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import EmailOutbox
+
+log = logging.getLogger(__name__)
+
+_UPSERT = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def enqueue(key, to, subject, html) -> bool:
+    """Queue a message in the caller's transaction; a repeated ``key`` is a no-op.
+
+    Nothing is committed here — the row lands with whatever the caller commits.
+    """
+    row = dict(key=key, recipient=to, subject=subject, html=html,
+               status='pending', attempts=0, next_attempt_at=datetime.utcnow())
+    insert = _UPSERT.get(db.engine.dialect.name)
+    if insert:
+        db.session.execute(insert(EmailOutbox).values(**row).on_conflict_do_nothing(index_elements=['key']))
+    elif not db.session.query(EmailOutbox.id).filter_by(key=key).first():
+        db.session.add(EmailOutbox(**row))
+    return True
+
+
+def _claim(size, now):
+    """Claim up to ``size`` due rows for this dispatcher and commit the claim.
+
+    Postgres skips rows another dispatcher has locked; elsewhere the guarded
+    UPDATE alone decides ownership. Rows stuck in ``sending`` past their claim
+    timeout are picked up again.
+    """
+    due = (EmailOutbox.status.in_(('pending', 'sending')), EmailOutbox.next_attempt_at <= now)
+    q = db.session.query(EmailOutbox.id).filter(*due).order_by(EmailOutbox.next_attempt_at).limit(size)
+    if db.engine.dialect.name == 'postgresql':
+        q = q.with_for_update(skip_locked=True)
+    ids = [i for i, in q]
+    if not ids:
+        db.session.rollback()
+        return []
+
+    token = uuid.uuid4().hex
+    EmailOutbox.query.filter(EmailOutbox.id.in_(ids), *due).update({
+        'status': 'sending', 'claim': token, 'attempts': EmailOutbox.attempts + 1,
+        'next_attempt_at': now + timedelta(seconds=current_app.config.get('OUTBOX_CLAIM_SECS', 300)),
+    }, synchronize_session=False)
+    db.session.commit()
+    return EmailOutbox.query.filter_by(claim=token).order_by(EmailOutbox.id).all()
+
+
+def dispatch() -> dict:
+    """Drain due outbox rows in batches until none are left. Needs an app context."""
+    from app.email import send_bulk, _message
+
+    cfg      = current_app.config
+    size     = cfg.get('OUTBOX_BATCH_SIZE', 100)
+    max_att  = cfg.get('OUTBOX_MAX_ATTEMPTS', 6)
+    backoff  = cfg.get('OUTBOX_BACKOFF_SECS', 60)
+    stats    = {'sent': 0, 'retry': 0, 'dead': 0}
+
+    while True:
+        now  = datetime.utcnow()
+        rows = _claim(size, now)
+        if not rows:
+            break
+        results = send_bulk([_message(r.subject, r.recipient, r.html) for r in rows])
+        now = datetime.utcnow()
+        for row, ok in zip(rows, results):
+            row.claim = None
+            if ok:
+                row.status, row.sent_at = 'sent', now
+                stats['sent'] += 1
+            elif row.attempts >= max_att:
+                row.status = 'dead'
+                stats['dead'] += 1
+                log.error('Outbox: giving up on %s after %d attempts', row.key, row.attempts)
+            else:
+                row.status = 'pending'
+                row.next_attempt_at = now + timedelta(seconds=backoff * 2 ** (row.attempts - 1))
+                stats['retry'] += 1
+        db.session.commit()
+
+    if any(stats.values()):
+        log.info('Outbox: %(sent)d sent, %(retry)d retrying, %(dead)d dead-lettered', stats)
+    return stats
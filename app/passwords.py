@@ -0,0 +1,122 @@
+"""bcrypt hashing off the request thread.
+
+Hashes run in a per-process pool of ``PASSWORD_POOL_SIZE`` workers behind a
+semaphore that caps how many requests may wait on it. Every web worker has its
+own pool, so the default is the host's cores split across ``WEB_CONCURRENCY``
+workers: all pools together use about one bcrypt per core.
+
+Sync workers use a ``ProcessPoolExecutor`` (the waiting request thread only
+sleeps). Under gevent the pool is native threads (bcrypt releases the GIL), so
+a waiting request parks its greenlet and the hub keeps serving. With
+``PASSWORD_POOL_SIZE = 0`` (tests) hashing runs inline.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+from flask import current_app
+
+_lock  = threading.Lock()
+_pool  = None
+_pid   = None
+_slots = None
+_stats = {'calls': 0, 'rejected': 0, 'in_flight': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+
+
+class PasswordPoolBusy(RuntimeError):
+    """Raised when no hashing slot frees up within ``PASSWORD_QUEUE_TIMEOUT``."""
+
+
+# ── Worker side (must stay picklable, module-level) ─────────────────────────
+
+def _hash(pw: bytes, rounds: int) -> str:
+    return bcrypt.hashpw(pw[:72], bcrypt.gensalt(rounds)).decode()
+
+def _check(pw: bytes, pw_hash: bytes) -> bool:
+    try:
+        return bcrypt.checkpw(pw[:72], pw_hash)
+    except ValueError:          # malformed stored hash
+        return False
+
+
+# ── Request side ────────────────────────────────────────────────────────────
+
+def default_size() -> int:
+    """Cores per web worker: ``cpu_count // WEB_CONCURRENCY``, at least one."""
+    return max(1, (os.cpu_count() or 1) // max(1, int(os.environ.get('WEB_CONCURRENCY', 1))))
+
+
+def _green():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+
+def _make_pool(size):
+    if not size:
+        return None
+    if _green():
+        from gevent.threadpool import ThreadPoolExecutor
+        return ThreadPoolExecutor(size)
+    return ProcessPoolExecutor(size, mp_context=multiprocessing.get_context('spawn'))
+
+
+def _executor(cfg):
+    """Per-process pool and limiter, recreated after a fork."""
+    global _pool, _pid, _slots
+    with _lock:
+        if _pid != os.getpid():
+            size   = cfg.get('PASSWORD_POOL_SIZE', default_size())
+            _pool  = _make_pool(size)
+            _slots = threading.BoundedSemaphore(cfg.get('PASSWORD_MAX_PENDING', 2 * (size or 1)))
+            _pid   = os.getpid()
+        return _pool, _slots
+
+
+def _run(fn, *args):
+    cfg = current_app.config
+    pool, slots = _executor(cfg)
+    t0 = time.perf_counter()
+    if not slots.acquire(timeout=cfg.get('PASSWORD_QUEUE_TIMEOUT', 5)):
+        with _lock:
+            _stats['rejected'] += 1
+        raise PasswordPoolBusy('password hashing pool saturated')
+    waited = time.perf_counter() - t0
+    with _lock:
+        _stats['calls']      += 1
+        _stats['in_flight']  += 1
+        _stats['wait_total'] += waited
+        _stats['wait_max']    = max(_stats['wait_max'], waited)
+    try:
+        return pool.submit(fn, *args).result() if pool else fn(*args)
+    finally:
+        slots.release()
+        with _lock:
+            _stats['in_flight'] -= 1
+
+
+def hash_password(pw: str) -> str:
+    return _run(_hash, pw.encode(), current_app.config.get('BCRYPT_LOG_ROUNDS', 12))
+
+
+def check_password(pw_hash: str, pw: str) -> bool:
+    return _run(_check, pw.encode(), pw_hash.encode())
+
+
+def needs_rehash(pw_hash: str) -> bool:
+    """True if ``pw_hash`` was made with fewer rounds than ``BCRYPT_LOG_ROUNDS``."""
+    try:
+        rounds = int(pw_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds < current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
+
+
+def stats() -> dict:
+    """Snapshot of call count, rejections, in-flight work and queue-wait seconds."""
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,55 @@
+"""Bounded deletes: chunked todo deletion and background purging of large accounts.
+
+Todos reference users with ``ON DELETE CASCADE``, so deleting a small account
+is one ``DELETE FROM users``. Accounts with more than ``PURGE_INLINE_MAX``
+live or archived todos are tombstoned instead (signed out everywhere, name and email freed) and
+the scheduler's ``purge`` job removes their todos ``PURGE_CHUNK`` rows per
+transaction before dropping the user row.
+"""
+import logging
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models import User, Todo, ArchivedTodo
+
+log = logging.getLogger(__name__)
+
+
+def delete_todos(*where, chunk=None, model=Todo) -> int:
+    """Delete ``model`` rows matching ``where`` in chunks, committing after each; returns the row count."""
+    chunk = chunk or current_app.config.get('PURGE_CHUNK', 1000)
+    total = 0
+    while True:
+        ids = [i for i, in db.session.query(model.id).filter(*where).order_by(model.id).limit(chunk)]
+        if not ids:
+            return total
+        total += model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def delete_account(user) -> bool:
+    """Delete ``user`` now, or tombstone it for the ``purge`` job; True when it is already gone."""
+    limit = current_app.config.get('PURGE_INLINE_MAX', 5000)
+    if all(db.session.query(m.id).filter(m.user_id == user.id).offset(limit).limit(1).first() is None
+           for m in (Todo, ArchivedTodo)):
+        db.session.delete(user)
+        db.session.commit()
+        return True
+    user.deleted_at = datetime.utcnow()
+    user.username   = f'deleted-{user.id}'
+    user.email      = f'deleted-{user.id}@invalid'
+    user.notify_reminder = user.notify_overdue = user.notify_digest = False
+    db.session.commit()
+    return False
+
+
+def purge() -> int:
+    """Finish tombstoned accounts: chunk-delete their todos, then the user row. Needs an app context."""
+    done = 0
+    for uid, in db.session.query(User.id).filter(User.deleted_at.isnot(None)).order_by(User.id).all():
+        n = delete_todos(Todo.user_id == uid) + delete_todos(ArchivedTodo.user_id == uid, model=ArchivedTodo)
+        User.query.filter_by(id=uid).delete()
+        db.session.commit()
+        log.info('Purged account %d (%d todos)', uid, n)
+        done += 1
+    return done
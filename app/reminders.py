@@ -0,0 +1,147 @@
+"""In-process min-heap of upcoming reminder instants.
+
+The scheduler loads the next ``REMINDER_HORIZON_MINS`` of timed reminders from
+the DB; a single thread sleeps until the earliest one is due. Only the
+leader's queue fires, so edits reach it through the change feed rather than
+from the route that made them: ``watch`` taps ``app.feed`` and the queue
+thread re-reads the changed todos. Changes that name no ids (imports,
+clears) reload the whole horizon instead.
+
+On Postgres the feed is ``NOTIFY``, so the leader sees every process's change
+as it commits. On other databases the feed is in-process, so only changes
+made in the leader's own process arrive at once; the rest are picked up by
+the next refill, up to ``REMINDER_REFILL_SECS`` later. The periodic sweep in
+``app.scheduler`` remains the safety net (untimed tasks, restarts).
+"""
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+
+log = logging.getLogger(__name__)
+
+
+class ReminderQueue:
+    def __init__(self):
+        self._heap    = []          # (fire_at, todo_id)
+        self._fire_at = {}          # todo_id → current fire_at; stale heap entries are skipped
+        self._stale   = set()       # todo ids changed since we last looked them up
+        self._cond    = threading.Condition()
+        self._thread  = None
+        self._on_due  = None
+        self._reload  = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, on_due, reload=None):
+        """Run ``on_due(todo_ids)`` from a background thread whenever reminders come due.
+
+        ``reload(todo_ids)`` is called on the same thread for ids passed to ``refresh``.
+        """
+        if self.running:
+            return
+        self._on_due, self._reload = on_due, reload
+        self._thread = threading.Thread(target=self._run, name='reminder-queue', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._on_due = None
+            self._cond.notify()
+
+    def push(self, todo_id, fire_at):
+        with self._cond:
+            if self._fire_at.get(todo_id) == fire_at:
+                return
+            self._fire_at[todo_id] = fire_at
+            heapq.heappush(self._heap, (fire_at, todo_id))
+            if self._heap[0] == (fire_at, todo_id):
+                self._cond.notify()
+
+    def cancel(self, todo_id):
+        with self._cond:
+            self._fire_at.pop(todo_id, None)
+
+    def refresh(self, todo_ids):
+        """Have the queue thread re-read ``todo_ids`` (they changed); returns at once."""
+        with self._cond:
+            self._stale.update(todo_ids)
+            self._cond.notify()
+
+    def __len__(self):
+        return len(self._fire_at)
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, todo_id = heapq.heappop(self._heap)
+            if self._fire_at.get(todo_id) == fire_at:
+                del self._fire_at[todo_id]
+                due.append(todo_id)
+        return due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._on_due is not None:
+                    now = datetime.utcnow()
+                    if self._stale or (self._heap and self._heap[0][0] <= now):
+                        break
+                    timeout = (self._heap[0][0] - now).total_seconds() if self._heap else None
+                    self._cond.wait(timeout)
+                if self._on_due is None:
+                    return
+                stale, self._stale = self._stale, set()
+                reload = self._reload
+            if stale and reload:
+                try:
+                    reload(stale)
+                except Exception:
+                    log.exception('Reminder reload failed for %d tasks', len(stale))
+            with self._cond:
+                due, on_due = self._pop_due(datetime.utcnow()), self._on_due
+            if due and on_due:
+                try:
+                    on_due(due)
+                except Exception:
+                    log.exception('Reminder dispatch failed for %d tasks', len(due))
+
+
+queue = ReminderQueue()
+
+
+def fire_at(todo):
+    """When ``todo``'s reminder should fire, or None if the wheel shouldn't track it."""
+    if todo.completed or todo.reminder_sent or todo.due_time is None or todo.due_at is None:
+        return None
+    return todo.due_at - timedelta(minutes=current_app.config['REMINDER_MINUTES_BEFORE'])
+
+
+def schedule(todo):
+    """Push/cancel ``todo``'s reminder in this process's queue."""
+    when = fire_at(todo)
+    if when is None:
+        queue.cancel(todo.id)
+    else:
+        queue.push(todo.id, when)
+
+
+def _on_change(evt):
+    from app import leader
+    if not (queue.running and leader.is_leader()):
+        return
+    if evt['changes']:
+        queue.refresh(c['id'] for c in evt['changes'])
+    else:                                   # import / clear: too many ids to list
+        from app.scheduler import kick
+        kick('reminder-refill')
+
+
+def watch():
+    """Feed every committed todo change to this process's queue while it leads."""
+    from app import feed
+    feed.broker.tap(_on_change)
+    feed.ensure_listener()
@@ -0,0 +1,117 @@
+"""Read-replica routing through ``SQLALCHEMY_BINDS['replica']`` (set from ``REPLICA_DATABASE_URL``).
+
+Plain ``SELECT``s issued inside ``reads()`` (or a view wrapped in
+``read_only``) go to the replica, unless
+
+* the session has written in its current transaction,
+* the request has committed a write, or the browser did so less than
+  ``REPLICA_STICKY_SECS`` ago (read-your-writes, via a session-cookie stamp), or
+* the replica failed to connect in the last ``REPLICA_RETRY_SECS``.
+
+Everything else — writes, ``FOR UPDATE``, text SQL, and all queries when no
+replica is configured — uses the primary. Keep ``reads()`` blocks to the
+reads themselves: anything that decides a write (lease fencing, uniqueness
+checks) must run outside them.
+
+Locally, point ``REPLICA_DATABASE_URL`` at a second SQLite file (a copy of
+the primary, e.g. ``sqlite3 app.db '.backup replica.db'``) or a second
+Postgres database, and at an unreachable one to exercise the fallback.
+
+This module is imported by ``app/__init__`` before ``db`` exists, so it must
+not import from ``app``.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from flask import current_app, g, has_request_context, session as web_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc
+from sqlalchemy.orm import Session as BaseSession
+from sqlalchemy.sql import Select
+
+log = logging.getLogger(__name__)
+
+BIND   = 'replica'
+STAMP  = '_primary_until'
+
+_reading    = ContextVar('replica_reads', default=False)
+_down_until = 0.0
+
+
+@contextmanager
+def reads():
+    """Let plain SELECTs in this block use the replica."""
+    token = _reading.set(True)
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+def read_only(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with reads():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def _sticky():
+    if not has_request_context():
+        return False
+    return g.get('wrote_primary', False) or web_session.get(STAMP, 0) > time.time()
+
+
+class RoutingSession(Session):
+    """``db.session`` class: sends eligible reads to the replica bind."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and _reading.get() and isinstance(clause, Select) and clause._for_update_arg is None
+                and not self._flushing and not self.info.get('wrote') and not _sticky()):
+            replica = self._replica()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica(self):
+        global _down_until
+        engine = self._db.engines.get(BIND)
+        if engine is None or time.monotonic() < _down_until:
+            return None
+        try:
+            self.connection(bind_arguments={'bind': engine})     # check out now, so a dead replica falls back
+        except exc.DBAPIError as e:
+            _down_until = time.monotonic() + current_app.config.get('REPLICA_RETRY_SECS', 30)
+            log.warning('Replica unavailable, reading from the primary: %s', e.orig)
+            return None
+        return engine
+
+
+# ── Write tracking ───────────────────────────
+
+@event.listens_for(BaseSession, 'after_flush')
+def _after_flush(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(BaseSession, 'do_orm_execute')
+def _on_execute(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info['wrote'] = True
+
+
+@event.listens_for(BaseSession, 'after_commit')
+def _after_commit(session):
+    if not session.info.pop('wrote', False) or not has_request_context():
+        return
+    g.wrote_primary = True
+    sticky = current_app.config.get('REPLICA_STICKY_SECS', 5)
+    if sticky and current_app.config.get('SQLALCHEMY_BINDS', {}).get(BIND):
+        web_session[STAMP] = time.time() + sticky
+
+
+@event.listens_for(BaseSession, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('wrote', None)
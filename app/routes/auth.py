@@ -1,13 +1,23 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response
 from flask_login import login_user, logout_user, login_required, current_user
-from app import db
-from app.models import User
+from app import db, purge, scheduler
+from app.passwords import PasswordPoolBusy, needs_rehash
+from app.models import User, forget_user
+from app.changes import touch
 from app.forms import LoginForm, RegisterForm, ProfileForm, ChangePasswordForm
 from app.email import send_welcome, send_pw_changed
 
 auth_bp = Blueprint('auth', __name__)
 
 
+def _busy(template, **ctx):
+    """Re-show ``template`` as a 503: the hashing pool is saturated, the input was fine."""
+    flash('The server is busy right now — please try again in a moment.', 'error')
+    resp = make_response(render_template(template, **ctx), 503)
+    resp.headers['Retry-After'] = '5'
+    return resp
+
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
@@ -15,9 +25,19 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data.lower()).first()
-        if not user or not user.check_password(form.password.data):
+        try:
+            ok = user is not None and user.check_password(form.password.data)
+        except PasswordPoolBusy:
+            return _busy('login.html', form=form)
+        if not ok:
             flash('Invalid email or password.', 'error')
             return redirect(url_for('auth.login'))
+        if needs_rehash(user.password_hash):
+            try:
+                user.set_password(form.password.data)
+                db.session.commit()
+            except PasswordPoolBusy:
+                pass                # already verified: upgrade the hash on a later sign-in
         login_user(user, remember=form.remember.data)
         return redirect(request.args.get('next') or url_for('todos.index'))
     return render_template('login.html', form=form)
@@ -33,12 +53,15 @@ def register():
             user = User(username=form.username.data.strip(), email=form.email.data.lower())
             user.set_password(form.password.data)
             db.session.add(user)
+            db.session.flush()
+            send_welcome(user)
             db.session.commit()
-            try: send_welcome(user)
-            except Exception: pass
             login_user(user)
             flash('Account created — welcome!', 'success')
             return redirect(url_for('todos.index'))
+        except PasswordPoolBusy:
+            db.session.rollback()
+            return _busy('register.html', form=form)
         except Exception as e:
             db.session.rollback()
             flash('An error occurred. Please try again.', 'error')
@@ -57,27 +80,29 @@ def logout():
 @auth_bp.route('/settings', methods=['GET', 'POST'])
 @login_required
 def settings():
-    pf  = ProfileForm(current_user.username, current_user.email, obj=current_user)
-    pwf = ChangePasswordForm()
+    user = db.session.get(User, current_user.id)
+    pf   = ProfileForm(user.username, user.email, obj=user)
+    pwf  = ChangePasswordForm()
     action = request.form.get('action', '')
 
     if request.method == 'POST':
         try:
             if action == 'profile' and pf.validate_on_submit():
-                current_user.username = pf.username.data.strip()
-                current_user.email    = pf.email.data.lower()
-                current_user.bio      = pf.bio.data
+                user.username = pf.username.data.strip()
+                user.email    = pf.email.data.lower()
+                user.bio      = pf.bio.data
+                touch(user.id)
                 db.session.commit()
+                forget_user(user.id)
                 flash('Profile updated.', 'success')
 
             elif action == 'password' and pwf.validate_on_submit():
-                if not current_user.check_password(pwf.current.data):
+                if not user.check_password(pwf.current.data):
                     flash('Current password is wrong.', 'error')
                 else:
-                    current_user.set_password(pwf.new.data)
+                    user.set_password(pwf.new.data)
+                    send_pw_changed(user)
                     db.session.commit()
-                    try: send_pw_changed(current_user)
-                    except Exception: pass
                     flash('Password updated.', 'success')
 
             elif action == 'appearance':
@@ -86,27 +111,31 @@ def settings():
                 flash('Appearance preferences saved.', 'success')
 
             elif action == 'notifications':
-                current_user.notify_reminder = 'notify_reminder' in request.form
-                current_user.notify_overdue  = 'notify_overdue'  in request.form
-                current_user.notify_digest   = 'notify_digest'   in request.form
+                user.notify_reminder = 'notify_reminder' in request.form
+                user.notify_overdue  = 'notify_overdue'  in request.form
+                user.notify_digest   = 'notify_digest'   in request.form
                 db.session.commit()
                 flash('Notification preferences saved.', 'success')
                 
+        except PasswordPoolBusy:
+            db.session.rollback()
+            return _busy('settings.html', pf=pf, pwf=pwf, user=user)
         except Exception as e:
             db.session.rollback()
             flash('An error occurred. Please try again.', 'error')
 
         return redirect(url_for('auth.settings'))
 
-    return render_template('settings.html', pf=pf, pwf=pwf)
+    return render_template('settings.html', pf=pf, pwf=pwf, user=user)
 
 
 @auth_bp.route('/delete', methods=['POST'])
 @login_required
 def delete_account():
-    user = current_user._get_current_object()
+    user = db.session.get(User, current_user.id)
     logout_user()
-    db.session.delete(user)
-    db.session.commit()
+    if not purge.delete_account(user):
+        scheduler.kick('purge')
+    forget_user(user.id)
     flash('Account deleted.', 'success')
     return redirect(url_for('main.index'))
\ No newline at end of file
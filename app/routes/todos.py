@@ -1,22 +1,93 @@
-from datetime import date
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+import base64
+from datetime import date, datetime
+from flask import (Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort,
+                   make_response, Response, session, stream_with_context)
 from flask_login import login_required, current_user
-from app import db
-from app.models import Todo
+from app import archive, db, feed, transfer
+from app.models import Todo, ArchivedTodo, due_at
+from app.search import search_todos
+from app.purge import delete_todos
 from app.forms import TodoForm
+from app.stats import FILTERS, todo_stats
+from app.changes import touch, conditional, version
+from app.fragments import render_rows
+from app.replica import read_only
 
 todos_bp = Blueprint('todos', __name__)
 
+PAGE_SIZE, MAX_PAGE_SIZE = 50, 200
+BULK_MAX = 1000
+
 
 def _own(id):
     return Todo.query.filter_by(id=id, user_id=current_user.id).first_or_404()
 
 
+def _encode_cursor(todo):
+    return base64.urlsafe_b64encode(f'{todo.created_at.isoformat()}|{todo.id}'.encode()).decode()
+
+def _decode_cursor(cursor):
+    try:
+        ts, id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(ts), int(id)
+    except ValueError:
+        abort(400)
+
+
+def _page(user_id, args):
+    """One keyset page of a user's todos, newest first, honouring ``filter``/``q``/``cursor``/``limit``.
+
+    Returns ``(todos, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    f     = args.get('filter', 'all')
+    q     = args.get('q', '').strip()
+    limit = min(max(args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    if f not in FILTERS:
+        abort(400)
+
+    query = Todo.query.filter(Todo.user_id == user_id, *FILTERS[f](date.today()))
+    if q:
+        escaped = q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        query = query.filter(Todo.title.ilike(f'%{escaped}%', escape='\\'))
+    if args.get('cursor'):
+        query = query.filter(db.tuple_(Todo.created_at, Todo.id) < _decode_cursor(args['cursor']))
+
+    todos = query.order_by(Todo.created_at.desc(), Todo.id.desc()).limit(limit + 1).all()
+    if len(todos) > limit:
+        return todos[:limit], _encode_cursor(todos[limit - 1])
+    return todos, None
+
+
 @todos_bp.route('/')
 @login_required
+@read_only
+@conditional
 def index():
-    todos = Todo.query.filter_by(user_id=current_user.id).order_by(Todo.created_at.desc()).all()
-    return render_template('todos.html', todos=todos, form=TodoForm(), today=date.today())
+    todos, cursor = _page(current_user.id, request.args)
+    f, q = request.args.get('filter', 'all'), request.args.get('q', '')
+    more = url_for('todos.index', filter=f, q=q or None, limit=request.args.get('limit'),
+                   cursor=cursor, partial=1) if cursor else None
+    ctx  = dict(todos=todos, cursor=cursor, more=more, form=TodoForm(), today=date.today(), filter=f, q=q,
+                live=feed.available())
+    if request.args.get('partial'):
+        resp = make_response(render_template('_task_rows.html', **ctx))
+        resp.headers['X-Next-Cursor'] = cursor or ''
+        return resp
+    return render_template('todos.html', counts=todo_stats(current_user.id), **ctx)
+
+
+def _wants_json():
+    return request.accept_mimetypes.best == 'application/json'
+
+
+def _done():
+    """End a form action: script callers get 204 (the change feed patches their page), browsers the list.
+
+    Failures have flashed an error, so they always redirect.
+    """
+    if _wants_json() and not any(cat == 'error' for cat, _ in session.get('_flashes', ())):
+        return '', 204
+    return redirect(url_for('todos.index'))
 
 
 @todos_bp.route('/add', methods=['POST'])
@@ -25,18 +96,21 @@ def add():
     form = TodoForm()
     if form.validate_on_submit():
         try:
-            db.session.add(Todo(
+            task = Todo(
                 title=form.title.data.strip(), priority=form.priority.data,
                 due_date=form.due_date.data, due_time=form.due_time.data,
                 user_id=current_user.id,
-            ))
+            )
+            db.session.add(task)
+            db.session.flush()
+            touch(current_user.id, ('upsert', task.id))
             db.session.commit()
         except Exception as e:
             db.session.rollback()
             flash('Error adding task. Please try again.', 'error')
     else:
         flash('Title is required.', 'error')
-    return redirect(url_for('todos.index'))
+    return _done()
 
 
 @todos_bp.route('/<int:id>/toggle', methods=['POST'])
@@ -47,11 +121,12 @@ def toggle(id):
         task.completed = not task.completed
         if not task.completed:
             task.reminder_sent = task.overdue_sent = False
+        touch(current_user.id, ('upsert', id))
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         flash('Error updating task.', 'error')
-    return redirect(url_for('todos.index'))
+    return _done()
 
 
 @todos_bp.route('/<int:id>/edit', methods=['GET', 'POST'])
@@ -63,17 +138,20 @@ def edit(id):
         try:
             task.title    = form.title.data.strip()
             task.priority = form.priority.data
-            if form.due_date.data != task.due_date:
+            if due_at(form.due_date.data, form.due_time.data) != task.due_at:
                 task.reminder_sent = task.overdue_sent = False
             task.due_date = form.due_date.data
             task.due_time = form.due_time.data
+            touch(current_user.id, ('upsert', id))
             db.session.commit()
+            if _wants_json():
+                return '', 204
             flash('Task updated.', 'success')
             return redirect(url_for('todos.index'))
         except Exception as e:
             db.session.rollback()
             flash('Error updating task.', 'error')
-    return render_template('edit_todo.html', form=form, todo=task)
+    return render_template('edit_todos.html', form=form, todo=task)
 
 
 @todos_bp.route('/<int:id>/delete', methods=['POST'])
@@ -81,27 +159,234 @@ def edit(id):
 def delete(id):
     try:
         db.session.delete(_own(id))
+        touch(current_user.id, ('delete', id))
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         flash('Error deleting task.', 'error')
-    return redirect(url_for('todos.index'))
+    return _done()
+
+
+# like ``toggle``: only flip rows that are in the other state, so uncompleting
+# an active task doesn't re-arm reminders it has already had
+BULK_SCOPE = {'complete':   (Todo.completed.is_(False),),
+              'uncomplete': (Todo.completed.is_(True),)}
+
+
+def _bulk_values(op, value):
+    """Column updates for a bulk ``op``; None means the request is invalid."""
+    if op == 'complete':
+        return {'completed': True, 'completed_at': db.func.coalesce(Todo.completed_at, datetime.utcnow())}
+    if op == 'uncomplete':
+        return {'completed': False, 'completed_at': None, 'reminder_sent': False, 'overdue_sent': False}
+    if op == 'priority':
+        return {'priority': value} if value in dict(TodoForm.priority.kwargs['choices']) else None
+    if op == 'reschedule':
+        try:
+            d = date.fromisoformat(value['due_date']) if value.get('due_date') else None
+            t = datetime.strptime(value['due_time'], '%H:%M').time() if value.get('due_time') else None
+        except (AttributeError, TypeError, ValueError):
+            return None
+        return {'due_date': d, 'due_time': t, 'due_at': due_at(d, t),
+                'reminder_sent': False, 'overdue_sent': False}
+    return None
+
+
+@todos_bp.route('/bulk', methods=['POST'])
+@login_required
+def bulk():
+    """Apply one operation to many of the user's todos in a single statement.
+
+    Body: ``{"ids": [...], "op": "complete|uncomplete|delete|priority|reschedule", "value": ...}``.
+    Ids the user doesn't own are ignored.
+    """
+    data = request.get_json(silent=True) or {}
+    ids, op = data.get('ids'), data.get('op')
+    if not isinstance(ids, list) or not ids or len(ids) > BULK_MAX or not all(isinstance(i, int) for i in ids):
+        return jsonify(error=f'ids must be a list of 1–{BULK_MAX} integers'), 400
+    values = None if op == 'delete' else _bulk_values(op, data.get('value'))
+    if op != 'delete' and values is None:
+        return jsonify(error='invalid op or value'), 400
+
+    scope = Todo.query.filter(Todo.user_id == current_user.id, Todo.id.in_(ids))
+    try:
+        if op == 'delete':
+            deleted, changed = [id for id, in scope.with_entities(Todo.id)], []
+            scope.delete(synchronize_session=False)
+        else:
+            scope.filter(*BULK_SCOPE.get(op, ())).update(values, synchronize_session=False)
+            deleted, changed = [], scope.populate_existing().all()
+        # serialise before the commit expires the rows (avoids a refresh per row)
+        payload = [t.to_dict() for t in changed]
+        touch(current_user.id, *[('delete', id) for id in deleted], *[('upsert', t.id) for t in changed])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        return jsonify(error='bulk update failed'), 500
+
+    return jsonify(op=op, changed=payload, deleted=deleted)
 
 
 @todos_bp.route('/clear-completed', methods=['POST'])
 @login_required
 def clear_completed():
+    """Delete the user's completed todos ``PURGE_CHUNK`` rows per transaction."""
     try:
-        Todo.query.filter_by(user_id=current_user.id, completed=True).delete()
+        n = delete_todos(Todo.user_id == current_user.id, Todo.completed)
+        touch(current_user.id)
         db.session.commit()
-        flash('Completed tasks cleared.', 'success')
     except Exception as e:
         db.session.rollback()
+        if _wants_json():
+            return jsonify(error='clear failed'), 500
         flash('Error clearing tasks.', 'error')
+        return redirect(url_for('todos.index'))
+    if _wants_json():
+        return jsonify(deleted=n)
+    flash(f'Cleared {n} completed task{"s" if n != 1 else ""}.', 'success')
     return redirect(url_for('todos.index'))
 
 
 @todos_bp.route('/api')
 @login_required
+@read_only
+@conditional
 def api():
-    return jsonify([t.to_dict() for t in Todo.query.filter_by(user_id=current_user.id).all()])
\ No newline at end of file
+    todos, cursor = _page(current_user.id, request.args)
+    return jsonify(items=[t.to_dict() for t in todos], next=cursor)
+
+
+def _archive_page():
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    return archive.page(current_user.id, request.args.get('before', type=int), limit)
+
+
+@todos_bp.route('/archive')
+@login_required
+@read_only
+@conditional
+def archived():
+    rows, before = _archive_page()
+    return render_template('archive.html', rows=rows, before=before, form=TodoForm())
+
+
+@todos_bp.route('/archive/api')
+@login_required
+@read_only
+@conditional
+def archive_api():
+    rows, before = _archive_page()
+    return jsonify(items=[r.to_dict() for r in rows], next=before)
+
+
+@todos_bp.route('/archive/<int:id>/restore', methods=['POST'])
+@login_required
+def restore(id):
+    """Un-complete an archived todo: it moves back to the live list with a new id."""
+    row = ArchivedTodo.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+    try:
+        task = archive.restore(row)
+        touch(current_user.id, ('upsert', task.id))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        if _wants_json():
+            return jsonify(error='restore failed'), 500
+        flash('Error restoring task.', 'error')
+        return redirect(url_for('todos.archived'))
+    if _wants_json():
+        return jsonify(task.to_dict())
+    flash('Task restored.', 'success')
+    return redirect(url_for('todos.archived'))
+
+
+@todos_bp.route('/<int:id>/row')
+@login_required
+def row(id):
+    """One rendered task row for the live feed; 204 when it no longer matches ``filter``."""
+    f = request.args.get('filter', 'all')
+    if f not in FILTERS:
+        abort(400)
+    todo = Todo.query.filter(Todo.id == id, Todo.user_id == current_user.id, *FILTERS[f](date.today())).first()
+    if todo is None:
+        return '', 204
+    return render_rows([todo], TodoForm(), date.today())
+
+
+@todos_bp.route('/events')
+@login_required
+def events():
+    """Server-Sent Events stream of this user's changes (see ``app.feed``).
+
+    Each connection stays open until the client leaves, so only gevent
+    workers serve it; elsewhere the 204 tells ``EventSource`` not to retry.
+    """
+    if not feed.available():
+        return '', 204
+    uid     = current_user.id
+    current = version(uid)[0]
+    last    = request.headers.get('Last-Event-ID', type=int)
+    feed.ensure_listener()
+    db.session.remove()                 # don't pin a pooled connection for the life of the stream
+    resp = Response(feed.stream(uid, last, current), mimetype='text/event-stream')
+    resp.headers['Cache-Control']     = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+
+@todos_bp.route('/search')
+@login_required
+@read_only
+@conditional
+def search():
+    q    = request.args.get('q', '').strip()
+    f    = request.args.get('filter', 'all')
+    page = max(request.args.get('page', 1, type=int), 1)
+    if f not in FILTERS:
+        abort(400)
+    todos, has_more = search_todos(current_user.id, q, page, where=FILTERS[f](date.today()))
+    if request.args.get('partial'):
+        more = url_for('todos.search', q=q, filter=f, page=page + 1, partial=1) if has_more else None
+        return render_template('_task_rows.html', todos=todos, more=more, form=TodoForm(), today=date.today())
+    return jsonify(items=[t.to_dict() for t in todos], page=page, next=page + 1 if has_more else None)
+
+
+@todos_bp.route('/stats')
+@login_required
+@read_only
+@conditional
+def stats():
+    return jsonify(todo_stats(current_user.id))
+
+
+EXPORTS = {'csv':    (transfer.export_csv,    'text/csv'),
+           'ndjson': (transfer.export_ndjson, 'application/x-ndjson')}
+
+
+@todos_bp.route('/export.<fmt>')
+@login_required
+def export(fmt):
+    if fmt not in EXPORTS:
+        abort(404)
+    rows, mimetype = EXPORTS[fmt]
+    resp = Response(stream_with_context(rows(current_user.id)), mimetype=mimetype)
+    resp.headers['Content-Disposition'] = f'attachment; filename=dozo-todos.{fmt}'
+    return resp
+
+
+@todos_bp.route('/import', methods=['POST'])
+@login_required
+def import_():
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify(error='no file uploaded'), 400
+    fmt = 'csv' if upload.filename.lower().endswith('.csv') else 'ndjson'
+    result = transfer.import_todos(upload.stream, fmt, current_user.id)
+    touch(current_user.id)
+    db.session.commit()
+    if _wants_json():
+        return jsonify(result)
+    flash(f"Imported {result['imported']} tasks"
+          + (f", skipped {result['skipped']}" if result['skipped'] else '') + '.',
+          'success' if result['imported'] else 'error')
+    return redirect(url_for('todos.index'))
\ No newline at end of file
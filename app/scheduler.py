@@ -1,83 +1,363 @@
 
 import logging
-from datetime import date, datetime, timedelta
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, time as time_
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
+from app import metrics, replica
 
 log = logging.getLogger(__name__)
 _scheduler = None
+_app       = None
+
+# Progress of the current/last digest run, for logs and metrics.
+digest_progress = {'started': None, 'users_total': 0, 'users_done': 0, 'queued': 0, 'pages': 0, 'duration': None}
+_digest_lock    = threading.Lock()
+
+
+def _user_batches(query, size):
+    """Yield ``query``'s ``(Todo, User)`` rows as ``[(user, [tasks]), ...]``, keyset-paged on (user_id, id).
+
+    A batch never ends part-way through a user unless that user alone fills
+    it, so each user's tasks normally arrive as one group per sweep.
+    """
+    from app import db
+    from app.models import Todo
+    last = (0, 0)
+    while True:
+        rows = query.filter(db.tuple_(Todo.user_id, Todo.id) > last)\
+                    .order_by(Todo.user_id, Todo.id).limit(size).all()
+        if not rows:
+            return
+        if len(rows) == size and rows[0][0].user_id != rows[-1][0].user_id:
+            tail = rows[-1][0].user_id              # may continue past the limit; finish it next batch
+            rows = [r for r in rows if r[0].user_id != tail]
+        last   = (rows[-1][0].user_id, rows[-1][0].id)   # read before the caller's commit expires it
+        groups = {}
+        for task, user in rows:
+            groups.setdefault(user.id, (user, []))[1].append(task)
+        yield list(groups.values())
+
+
+def _sweep(name, query, send, flag, size, fence):
+    """Queue one notification per user for their matching tasks, committing after every batch.
+
+    ``send(user, tasks)`` enqueues the message; ``flag`` is then set on all
+    sent tasks with one UPDATE. The outbox rows and the flag update land in the
+    same commit, which is refused if another process has taken the lease since
+    ``fence`` was issued.
+    """
+    from app import db, leader
+    from app.models import Todo
+    stats = {'batches': 0, 'rows': 0, 'sent': 0}
+    for groups in _user_batches(query, size):
+        t0, done = time.perf_counter(), []
+        for user, tasks in groups:
+            if send(user, tasks):
+                done += [t.id for t in tasks]
+                stats['sent'] += 1
+        if done:
+            Todo.query.filter(Todo.id.in_(done)).update({flag: True}, synchronize_session=False)
+        try:
+            leader.check(fence)
+        except leader.LeaseLost:
+            db.session.rollback()
+            raise
+        db.session.commit()
+        rows = sum(len(tasks) for _, tasks in groups)
+        stats['batches'] += 1
+        stats['rows']    += rows
+        log.debug('%s batch %d: %d tasks for %d users, %d queued in %.1fms', name, stats['batches'],
+                  rows, len(groups), stats['sent'], (time.perf_counter() - t0) * 1000)
+    return stats
+
+
+def _due_window(today, now, window):
+    """SQL clause for tasks due today whose ``due_at`` falls in ``[now, window]``.
+
+    Untimed tasks due today always qualify. The outer range keeps the predicate
+    on ``ix_todos_reminder_pending``.
+    """
+    from app import db
+    from app.models import Todo
+    day = Todo.due_at.between(datetime.combine(today, time_.min), datetime.combine(today, time_.max))
+    return db.and_(day, db.or_(Todo.due_time.is_(None), Todo.due_at.between(now, window)))
 
 
 def _check_reminders(app):
+    from app import leader
+    fence = leader.token()
+    if fence is None:
+        return
     with app.app_context():
         from app import db
         from app.models import Todo, User
-        from app.email import send_reminder, send_overdue
+        from app.email import send_reminders, send_overdues
 
         mins   = app.config['REMINDER_MINUTES_BEFORE']
+        size   = app.config.get('SCHEDULER_BATCH_SIZE', 500)
         now    = datetime.utcnow()
         today  = date.today()
         window = now + timedelta(minutes=mins)
 
-        due_soon = Todo.query.filter_by(completed=False, reminder_sent=False)\
-                             .filter(Todo.due_date == today).all()
-        for task in due_soon:
-            if task.due_time:
-                due_dt = datetime.combine(task.due_date, task.due_time)
-                if not (now <= due_dt <= window):
-                    continue
-            user = User.query.get(task.user_id)
-            if user and send_reminder(user, task):
-                task.reminder_sent = True
-
-        overdue = Todo.query.filter_by(completed=False, overdue_sent=False)\
-                            .filter(Todo.due_date < today).all()
-        for task in overdue:
-            user = User.query.get(task.user_id)
-            if user and send_overdue(user, task):
-                task.overdue_sent = True
+        candidates = db.session.query(Todo, User).join(User, Todo.user_id == User.id)\
+                                                 .filter(~Todo.completed)
 
-        db.session.commit()
-        log.debug('Reminders: %d due, %d overdue', len(due_soon), len(overdue))
+        due_soon = _sweep('reminders', candidates.filter(~Todo.reminder_sent,
+                                                         User.notify_reminder.is_(True),
+                                                         _due_window(today, now, window)),
+                          send_reminders, 'reminder_sent', size, fence)
+        overdue  = _sweep('overdue',   candidates.filter(~Todo.overdue_sent,
+                                                         User.notify_overdue.is_(True),
+                                                         Todo.due_at < datetime.combine(today, time_.min)),
+                          send_overdues, 'overdue_sent', size, fence)
 
+        log.debug('Reminders: %d due, %d overdue (%d + %d batches)', due_soon['rows'],
+                  overdue['rows'], due_soon['batches'], overdue['batches'])
+        return {'reminders': due_soon, 'overdue': overdue}
 
-def _send_digests(app):
+
+def _fire_reminders(app, ids):
+    """Queue reminders the in-process queue says are due now (re-checked against the DB)."""
+    from app import leader
+    fence = leader.token()
+    if fence is None:
+        return
     with app.app_context():
-        from app.models import User, Todo
+        from app import db
+        from app.models import Todo, User
+        from app.email import send_reminders
+
+        now   = datetime.utcnow()
+        query = db.session.query(Todo, User).join(User, Todo.user_id == User.id)\
+                                            .filter(Todo.id.in_(ids), ~Todo.completed, ~Todo.reminder_sent,
+                                                    User.notify_reminder.is_(True),
+                                                    _due_window(date.today(), now,
+                                                                now + timedelta(minutes=app.config['REMINDER_MINUTES_BEFORE'])))
+        stats = _sweep('reminders (queued)', query, send_reminders, 'reminder_sent',
+                       app.config.get('SCHEDULER_BATCH_SIZE', 500), fence)
+    if stats['sent']:
+        kick('outbox')
+    return stats
+
+
+def _refill_reminders(app):
+    """Load timed reminders firing within the next REMINDER_HORIZON_MINS into the queue."""
+    from app import leader
+    from app.reminders import queue
+    if not leader.is_leader():
+        return
+    with app.app_context():
+        from app.models import Todo
+
+        lead    = timedelta(minutes=app.config['REMINDER_MINUTES_BEFORE'])
+        now     = datetime.utcnow()
+        horizon = now + timedelta(minutes=app.config.get('REMINDER_HORIZON_MINS', 10))
+        rows = Todo.query.with_entities(Todo.id, Todo.due_at)\
+                         .filter(~Todo.completed, ~Todo.reminder_sent, Todo.due_time.isnot(None),
+                                 Todo.due_at.between(now, horizon + lead)).all()
+    for id, due in rows:
+        queue.push(id, due - lead)
+    log.debug('Reminder queue: %d loaded, %d pending', len(rows), len(queue))
+
+
+def _reload_reminders(app, ids):
+    """Re-read todos the change feed says were edited and update their queue entries."""
+    from app import reminders
+    with app.app_context():
+        from app.models import Todo
+
+        todos = Todo.query.filter(Todo.id.in_(ids)).all()
+        for todo in todos:
+            reminders.schedule(todo)
+    for id in set(ids) - {t.id for t in todos}:
+        reminders.queue.cancel(id)
+
+
+def _digest_page(users, today, week_out):
+    """Fetch overdue/due-today/upcoming buckets for a page of users in one query."""
+    from app.models import Todo
+    buckets = {u.id: ([], [], []) for u in users}
+    rows = Todo.query.filter(Todo.user_id.in_(buckets), ~Todo.completed,
+                             Todo.due_date <= week_out)\
+                     .order_by(Todo.user_id, Todo.due_date, Todo.id).all()
+    for t in rows:
+        overdue, due_today, upcoming = buckets[t.user_id]
+        if t.due_date < today:    overdue.append(t)
+        elif t.due_date == today: due_today.append(t)
+        elif len(upcoming) < 10:  upcoming.append(t)
+    return buckets
+
+
+def _digest_shard(app, lo, hi, fence):
+    """Queue digests for digest-enabled users with ``lo <= id < hi``, one page at a time.
+
+    Page reads go to the replica when there is one; each page's outbox rows go to the primary.
+    """
+    with app.app_context():
+        from app import db, leader
+        from app.models import User
         from app.email import send_digest
 
+        size     = app.config.get('DIGEST_PAGE_SIZE', 200)
         today    = date.today()
         week_out = today + timedelta(days=7)
+        last     = lo - 1
+        while True:
+            # only the page reads may use the replica; the fencing check must see the primary
+            with replica.reads():
+                users = User.query.filter(User.notify_digest.is_(True), User.id > last, User.id < hi)\
+                                  .order_by(User.id).limit(size).all()
+                if not users:
+                    return
+                last    = users[-1].id
+                buckets = _digest_page(users, today, week_out)
+            queued  = sum(bool(send_digest(u, *buckets[u.id])) for u in users)
+            try:
+                leader.check(fence)
+            except leader.LeaseLost:
+                db.session.rollback()
+                raise
+            db.session.commit()
+            with _digest_lock:
+                digest_progress['users_done'] += len(users)
+                digest_progress['queued']     += queued
+                digest_progress['pages']      += 1
+
+
+def _send_digests(app):
+    """Queue the daily digest, sharding users by id range across a small thread pool."""
+    from app import leader
+    fence = leader.token()
+    if fence is None:
+        return
+    with app.app_context(), replica.reads():
+        from app import db
+        from app.models import User
+
+        lo, hi, total = db.session.query(db.func.min(User.id), db.func.max(User.id), db.func.count(User.id))\
+                                  .filter(User.notify_digest.is_(True)).one()
+    t0 = time.perf_counter()
+    digest_progress.update(started=datetime.utcnow(), users_total=total, users_done=0,
+                           queued=0, pages=0, duration=None)
+    if not total:
+        digest_progress['duration'] = 0.0
+        return digest_progress
+
+    shards = max(1, min(app.config.get('DIGEST_SHARDS', 4), total))
+    step   = (hi - lo) // shards + 1
+    with ThreadPoolExecutor(max_workers=shards, thread_name_prefix='digest') as pool:
+        for f in [pool.submit(metrics.bound(_digest_shard), app, lo + n * step, lo + (n + 1) * step, fence) for n in range(shards)]:
+            f.result()
+
+    digest_progress['duration'] = time.perf_counter() - t0
+    log.info('Digest: %(queued)d queued for %(users_done)d/%(users_total)d users '
+             'in %(pages)d pages, %(duration).1fs', digest_progress)
+    return digest_progress
+
+
+def _heartbeat(app):
+    with app.app_context():
+        from app import leader
+        leader.heartbeat()
+
+
+def _dispatch_outbox(app):
+    with app.app_context():
+        from app.outbox import dispatch
+        return dispatch()
+
+
+def _purge_accounts(app):
+    from app import leader
+    if not leader.is_leader():
+        return
+    with app.app_context():
+        from app.purge import purge
+        return purge()
 
-        for user in User.query.filter_by(notify_digest=True).all():
-            send_digest(
-                user,
-                overdue   = Todo.query.filter_by(user_id=user.id, completed=False).filter(Todo.due_date < today).order_by(Todo.due_date).all(),
-                due_today = Todo.query.filter_by(user_id=user.id, completed=False).filter(Todo.due_date == today).all(),
-                upcoming  = Todo.query.filter_by(user_id=user.id, completed=False).filter(Todo.due_date > today, Todo.due_date <= week_out).limit(10).all(),
-            )
+
+def _archive_todos(app):
+    from app import leader
+    if not leader.is_leader():
+        return
+    with app.app_context():
+        from app.archive import archive
+        return archive()
+
+
+def kick(job_id):
+    """Run ``job_id`` now instead of at its next interval, if this process schedules it."""
+    job = _scheduler.get_job(job_id) if _scheduler and _scheduler.running else None
+    if job:
+        job.modify(next_run_time=datetime.utcnow())
 
 
 def start(app):
-    global _scheduler
+    """Start the scheduler in this process; sweeps only run while it holds the lease."""
+    global _scheduler, _app
     if _scheduler and _scheduler.running:
         return
+    _app = app
 
     interval = app.config.get('SCHEDULER_INTERVAL_MINS', 15)
     _scheduler = BackgroundScheduler(timezone='UTC', daemon=True)
+    job        = lambda name, fn: metrics.instrument(app, name, fn)
 
-    _scheduler.add_job(_check_reminders, IntervalTrigger(minutes=interval),
+    _scheduler.add_job(job('leader', _heartbeat), IntervalTrigger(seconds=app.config.get('LEADER_HEARTBEAT_SECS', 10)),
+                       args=[app], id='leader',    replace_existing=True, max_instances=1, coalesce=True,
+                       next_run_time=datetime.utcnow())
+    _scheduler.add_job(job('reminder-refill', _refill_reminders), IntervalTrigger(seconds=app.config.get('REMINDER_REFILL_SECS', 60)),
+                       args=[app], id='reminder-refill', replace_existing=True, max_instances=1, coalesce=True)
+    _scheduler.add_job(job('reminders', _check_reminders), IntervalTrigger(minutes=interval),
                        args=[app], id='reminders', replace_existing=True, misfire_grace_time=300)
-    _scheduler.add_job(_send_digests, CronTrigger(hour=9, minute=0),
+    _scheduler.add_job(job('digest', _send_digests), CronTrigger(hour=9, minute=0),
                        args=[app], id='digest',    replace_existing=True, misfire_grace_time=600)
+    _scheduler.add_job(job('outbox', _dispatch_outbox), IntervalTrigger(seconds=app.config.get('OUTBOX_POLL_SECS', 30)),
+                       args=[app], id='outbox',    replace_existing=True, max_instances=1, coalesce=True)
+    _scheduler.add_job(job('purge', _purge_accounts), IntervalTrigger(seconds=app.config.get('PURGE_POLL_SECS', 60)),
+                       args=[app], id='purge',     replace_existing=True, max_instances=1, coalesce=True)
+    if app.config.get('ARCHIVE_AFTER_DAYS'):
+        _scheduler.add_job(job('archive', _archive_todos), IntervalTrigger(seconds=app.config.get('ARCHIVE_POLL_SECS', 3600)),
+                           args=[app], id='archive', replace_existing=True, max_instances=1, coalesce=True)
 
     _scheduler.start()
-    log.info('Scheduler started — reminders every %dm, digest at 09:00 UTC', interval)
+    from app import reminders
+    reminders.queue.start(job('reminder-fire', lambda ids: _fire_reminders(app, ids)),
+                          lambda ids: _reload_reminders(app, ids))
+    with app.app_context():
+        reminders.watch()
+    log.info('Scheduler started — reminder queue + %dm reconciliation sweep, digest at 09:00 UTC', interval)
+
+
+def init_app(app):
+    @app.cli.command('scheduler')
+    def scheduler_command():
+        """Run the scheduler and reminder queue in the foreground (the Procfile ``worker``)."""
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        start(app)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop()
 
 
 def stop():
     global _scheduler
     if _scheduler and _scheduler.running:
         _scheduler.shutdown(wait=False)
+    from app.reminders import queue
+    queue.stop()
+    if _app is not None:
+        with _app.app_context():
+            from app import leader
+            leader.release()
         
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""Ranked, prefix-matched title search.
+
+Postgres uses a GIN index over ``to_tsvector('simple', title)``; SQLite uses an
+external-content FTS5 table kept in sync by triggers. Other dialects fall back
+to ``ILIKE``.
+"""
+import re
+from sqlalchemy import DDL
+from app import db
+from app.models import Todo
+
+# must match the indexed expression exactly so Postgres can use the GIN index
+TSVECTOR = db.func.to_tsvector(db.literal_column("'simple'"), Todo.title)
+
+_fts = db.table('todos_fts', db.column('rowid'), db.column('rank'))
+
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(title, content='todos', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS todos_fts_ai AFTER INSERT ON todos BEGIN "
+    "INSERT INTO todos_fts(rowid, title) VALUES (new.id, new.title); END",
+    "CREATE TRIGGER IF NOT EXISTS todos_fts_ad AFTER DELETE ON todos BEGIN "
+    "INSERT INTO todos_fts(todos_fts, rowid, title) VALUES ('delete', old.id, old.title); END",
+    "CREATE TRIGGER IF NOT EXISTS todos_fts_au AFTER UPDATE OF title ON todos BEGIN "
+    "INSERT INTO todos_fts(todos_fts, rowid, title) VALUES ('delete', old.id, old.title); "
+    "INSERT INTO todos_fts(rowid, title) VALUES (new.id, new.title); END",
+]
+
+for _stmt in SQLITE_FTS:
+    db.event.listen(Todo.__table__, 'after_create', DDL(_stmt).execute_if(dialect='sqlite'))
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """Keep Alembic autogenerate away from the FTS5 table and its shadow tables."""
+    return not (type_ == 'table' and name.startswith('todos_fts'))
+
+
+def _terms(q):
+    return re.findall(r'\w+', q.lower())[:8]
+
+
+def search_todos(user_id, q, page=1, per_page=25, where=()):
+    """One page of the user's todos matching every word of ``q`` as a prefix, best first.
+
+    ``where`` narrows it further (the list's ``app.stats.FILTERS`` predicates).
+    Returns ``(todos, has_more)``.
+    """
+    terms = _terms(q)
+    if not terms:
+        return [], False
+
+    query   = Todo.query.filter(Todo.user_id == user_id, *where)
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        tsq   = db.func.to_tsquery(db.literal_column("'simple'"), ' & '.join(f'{t}:*' for t in terms))
+        query = query.filter(TSVECTOR.op('@@')(tsq)).order_by(db.func.ts_rank(TSVECTOR, tsq).desc(), Todo.id.desc())
+    elif dialect == 'sqlite':
+        query = query.join(_fts, _fts.c.rowid == Todo.id)\
+                     .filter(db.text('todos_fts MATCH :match').bindparams(match=' '.join(f'"{t}"*' for t in terms)))\
+                     .order_by(_fts.c.rank, Todo.id.desc())
+    else:
+        for t in terms:
+            query = query.filter(Todo.title.ilike(f'%{t}%'))
+        query = query.order_by(Todo.created_at.desc(), Todo.id.desc())
+
+    rows = query.offset((page - 1) * per_page).limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
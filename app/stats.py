@@ -0,0 +1,37 @@
+"""Per-user todo counters for the sidebar, computed in one aggregate query and cached per version."""
+from datetime import date
+from app import db
+from app.cache import TTLCache
+from app.changes import version
+from app.models import Todo
+
+# Sidebar filters → WHERE clauses (a callable because ``overdue`` depends on today).
+FILTERS = {
+    'all':       lambda today: (),
+    'active':    lambda today: (~Todo.completed,),
+    'completed': lambda today: (Todo.completed,),
+    'high':      lambda today: (Todo.priority == 'high',),
+    'overdue':   lambda today: (~Todo.completed, Todo.due_date < today),
+}
+
+# Entries are keyed on the user's change version, so other workers' writes are seen immediately.
+_cache = TTLCache(maxsize=4096, ttl=600)
+
+
+def _aggregate(user_id, today):
+    cols = [db.func.count(Todo.id).filter(*where(today)) if where(today) else db.func.count(Todo.id)
+            for where in FILTERS.values()]
+    row = db.session.query(*cols).filter(Todo.user_id == user_id).one()
+    return dict(zip(FILTERS, row))
+
+
+def todo_stats(user_id) -> dict:
+    """``{filter: count}`` for every sidebar filter; cached until the user's version or the day changes."""
+    today = date.today()
+    ver   = version(user_id)[0]
+    hit   = _cache.get(user_id)
+    if hit and hit[:2] == (today, ver):
+        return hit[2]
+    counts = _aggregate(user_id, today)
+    _cache.set(user_id, (today, ver, counts))
+    return counts
@@ -0,0 +1,127 @@
+"""Streaming todo export (CSV / NDJSON) and chunked bulk import."""
+import csv
+import io
+import json
+from datetime import date, datetime
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.forms import TodoForm
+from app.models import Todo, ArchivedTodo, due_at
+
+FIELDS     = ('id', 'title', 'completed', 'priority', 'due_date', 'due_time', 'created_at')
+PRIORITIES = dict(TodoForm.priority.kwargs['choices'])
+TITLE_MAX  = 256
+CHUNK      = 1000
+
+
+# ── Export ──────────────────────────────────────────────────────────────────
+
+def _rows(user_id):
+    """Yield plain tuples from a server-side cursor, ``CHUNK`` rows per fetch; archived todos last."""
+    live = db.session.query(*(getattr(Todo, f) for f in FIELDS)).filter(Todo.user_id == user_id)\
+                     .order_by(Todo.id)
+    cols = {'id': ArchivedTodo.todo_id, 'completed': db.literal(True)}
+    cold = db.session.query(*(cols[f] if f in cols else getattr(ArchivedTodo, f) for f in FIELDS))\
+                     .filter(ArchivedTodo.user_id == user_id).order_by(ArchivedTodo.id)
+    for q in (live, cold):
+        for row in q.execution_options(yield_per=CHUNK):
+            yield [v.isoformat() if hasattr(v, 'isoformat') else v for v in row]
+
+
+def export_csv(user_id):
+    buf = io.StringIO()
+    out = csv.writer(buf)
+    out.writerow(FIELDS)
+    for n, row in enumerate(_rows(user_id), 1):
+        out.writerow(row)
+        if n % CHUNK == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def export_ndjson(user_id):
+    chunk = []
+    for row in _rows(user_id):
+        chunk.append(json.dumps(dict(zip(FIELDS, row))))
+        if len(chunk) == CHUNK:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+# ── Import ──────────────────────────────────────────────────────────────────
+
+def _bool(v):
+    return v if isinstance(v, bool) else str(v).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def _clean(rec, user_id):
+    """Apply the ``TodoForm`` rules to one record; raises ValueError with a reason."""
+    title = str(rec.get('title') or '').strip()
+    if not title:
+        raise ValueError('title is required')
+    if len(title) > TITLE_MAX:
+        raise ValueError(f'title longer than {TITLE_MAX} characters')
+    priority = rec.get('priority') or 'normal'
+    if priority not in PRIORITIES:
+        raise ValueError(f'unknown priority {priority!r}')
+    d = date.fromisoformat(rec['due_date']) if rec.get('due_date') else None
+    t = datetime.strptime(rec['due_time'][:5], '%H:%M').time() if rec.get('due_time') else None
+    done = _bool(rec.get('completed') or False)
+    return dict(title=title, priority=priority, due_date=d, due_time=t, due_at=due_at(d, t),
+                completed=done, completed_at=datetime.utcnow() if done else None,
+                reminder_sent=done, overdue_sent=done, user_id=user_id)
+
+
+def _records(stream, fmt):
+    """Dicts for CSV, raw lines for NDJSON (parsed per record so one bad line is just skipped)."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        yield from csv.DictReader(text)
+    else:
+        yield from (line for line in text if line.strip())
+
+
+def _save(batch, last, result, max_errors):
+    """Insert and commit one batch; a DB error rolls it back and counts it as skipped."""
+    try:
+        db.session.execute(insert(Todo), batch)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        result['skipped'] += len(batch)
+        if len(result['errors']) < max_errors:
+            result['errors'].append(f'records {last - len(batch) + 1}–{last} not saved: {e.__class__.__name__}')
+        return
+    result['imported'] += len(batch)
+
+
+def import_todos(stream, fmt, user_id, max_errors=20):
+    """Validate and insert records from ``stream`` in ``CHUNK``-row executemany batches.
+
+    Invalid records are skipped; each batch is committed as it fills, and a
+    batch the DB rejects is rolled back and skipped whole.
+    Returns ``{'imported', 'skipped', 'errors'}``.
+    """
+    result, batch, line = {'imported': 0, 'skipped': 0, 'errors': []}, [], 0
+    try:
+        for line, rec in enumerate(_records(stream, fmt), 1):
+            try:
+                batch.append(_clean(json.loads(rec) if isinstance(rec, str) else rec, user_id))
+            except (ValueError, TypeError, AttributeError, KeyError) as e:
+                result['skipped'] += 1
+                if len(result['errors']) < max_errors:
+                    result['errors'].append(f'record {line}: {e}')
+                continue
+            if len(batch) == CHUNK:
+                _save(batch, line, result, max_errors)
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        result['errors'].append(f'unreadable input: {e}')
+    if batch:
+        _save(batch, line, result, max_errors)
+    return result
@@ -0,0 +1,56 @@
+"""Per-email render cost: render_template_string on every send vs. the cached templates.
+
+    python bench/email_render.py --messages 10000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MAIL_PORT', '25')
+os.environ.setdefault('REMINDER_MINUTES_BEFORE', '60')
+
+from flask import render_template_string                 # noqa: E402
+from app import create_app                               # noqa: E402
+from app import email                                    # noqa: E402
+
+
+def digest_ctx(i):
+    today = date.today()
+    task  = lambda n, d: SimpleNamespace(title=f'task {i}-{n}', due_date=today + timedelta(days=d))
+    return dict(user=f'user{i}', today=today.strftime('%A, %B %d'),
+                overdue=[task(n, -1) for n in range(3)], due_today=[task(n, 0) for n in range(2)],
+                upcoming=[task(n, n + 1) for n in range(5)])
+
+
+def uncached(**ctx):
+    """The pre-change ``_r``: parse + compile the template and interpolate the CSS every call."""
+    return render_template_string(email._DIGEST, css=email._CSS, url=email._url(), **ctx)
+
+
+def run(label, render, n):
+    t0 = time.perf_counter()
+    for i in range(n):
+        render(**digest_ctx(i))
+    total = time.perf_counter() - t0
+    print(f'{label:<10} {n} digests in {total:.2f}s — {total / n * 1e6:.0f}µs/email')
+    return total
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--messages', type=int, default=10_000)
+    args = ap.parse_args()
+
+    app = create_app('testing')
+    with app.test_request_context():
+        before = run('uncached', uncached, args.messages)
+        after  = run('cached', lambda **ctx: email._r(email._DIGEST, **ctx), args.messages)
+    print(f'speed-up   {before / after:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
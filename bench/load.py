@@ -0,0 +1,228 @@
+"""Scripted load scenarios reporting latency percentiles, throughput and SQL counts as JSON.
+
+    python bench/load.py --users 200 --todos 200 --out run.json
+    python bench/load.py --users 200 --todos 200 --baseline run.json     # exit 1 on regressions
+    python bench/load.py --replica sqlite:////tmp/dozo_replica.db          # reads on a copied stand-in
+
+Runs ``create_app('testing')`` against a file database, seeds ``--users`` ×
+``--todos`` deterministic rows (``--seed``), routes mail to an in-process
+``SMTPSink`` and runs, in order: list page, /todos/api, login burst, reminder
+sweep, digest run, bulk clear. Query counts come from ``app.metrics``.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MAIL_PORT', '25')
+os.environ.setdefault('REMINDER_MINUTES_BEFORE', '60')
+
+from config import configs, TestConfig                   # noqa: E402
+from app import create_app, db, metrics, passwords      # noqa: E402
+from query_plans import seed                             # noqa: E402
+from smtp_sink import SMTPSink                           # noqa: E402
+
+PASSWORD = 'bench-password'
+FILTERS  = ('all', 'active', 'completed', 'high', 'overdue')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))]
+
+
+def total_queries():
+    return sum(row['queries'] for row in metrics.registry.snapshot().values())
+
+
+def run(name, ops, fn, concurrency=1):
+    """Call ``fn(i)`` for ``i in range(ops)``; ``fn`` returns True on success."""
+    def call(i):
+        t0 = time.perf_counter()
+        ok = fn(i)
+        return time.perf_counter() - t0, ok
+
+    q0, t0 = total_queries(), time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(call, range(ops)))
+    else:
+        results = [call(i) for i in range(ops)]
+    wall = time.perf_counter() - t0
+
+    lat = sorted(r[0] * 1000 for r in results)
+    out = dict(ops=ops, errors=sum(not r[1] for r in results), seconds=round(wall, 4),
+               throughput=round(ops / wall, 2), queries_per_op=round((total_queries() - q0) / ops, 2),
+               **{f'p{p}_ms': round(percentile(lat, p), 3) for p in (50, 90, 99)}, max_ms=round(lat[-1], 3))
+    print(f'{name:<15} {ops:>6} ops  {out["throughput"]:>9.1f}/s  p50 {out["p50_ms"]:>8.2f}ms  '
+          f'p99 {out["p99_ms"]:>8.2f}ms  {out["queries_per_op"]:>6.1f} q/op  {out["errors"]} errors',
+          file=sys.stderr)
+    return out
+
+
+class Clients:
+    """One cookie-less test client per thread; requests authenticate with a pre-signed session."""
+
+    def __init__(self, app):
+        self.app     = app
+        self.signer  = app.session_interface.get_signing_serializer(app)
+        self.cookie  = app.config.get('SESSION_COOKIE_NAME', 'session')
+        self._local  = threading.local()
+
+    def get(self):
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.app.test_client(use_cookies=False)
+        return self._local.client
+
+    def auth(self, user_id):
+        return {'Cookie': f'{self.cookie}={self.signer.dumps({"_user_id": str(user_id), "_fresh": True})}'}
+
+
+def scenarios(app, args, sink):
+    from app import leader
+    from app.scheduler import _check_reminders, _send_digests, _dispatch_outbox
+
+    clients = Clients(app)
+    user    = lambda i: i % args.users + 1
+    results = {}
+
+    def page(i):
+        r = clients.get().get('/todos/', headers=clients.auth(user(i)))
+        return r.status_code == 200
+
+    def api(i):
+        r = clients.get().get(f'/todos/api?limit=50&filter={FILTERS[i % len(FILTERS)]}', headers=clients.auth(user(i)))
+        return r.status_code == 200
+
+    def login(i):
+        r = clients.get().post('/auth/login', data={'email': f'user{user(i)}@example.com', 'password': PASSWORD})
+        return r.status_code == 302 and r.headers['Location'].endswith('/todos/')
+
+    def job(name, fn):
+        def once(_):
+            sink.reset()
+            with app.app_context():
+                leader.heartbeat()
+            metrics.instrument(app, name, fn)(app)
+            metrics.instrument(app, 'outbox', _dispatch_outbox)(app)
+            once.messages = sink.messages
+            return True
+        return once
+
+    def clear(i):
+        r = clients.get().post('/todos/clear-completed', headers=clients.auth(user(i)))
+        return r.status_code == 302
+
+    results['list_page'] = run('list_page', args.requests, page, args.concurrency)
+    results['api']       = run('api', args.requests, api, args.concurrency)
+    results['login']     = run('login', args.logins, login, args.concurrency)
+    for name, fn in (('reminder_sweep', _check_reminders), ('digest', _send_digests)):
+        once = job(name, fn)
+        results[name] = dict(run(name, 1, once), emails=once.messages)
+    results['bulk_clear'] = run('bulk_clear', args.users, clear, args.concurrency)
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """Regressions of ``current`` against ``baseline``: slower p90 beyond ``tolerance`` or more queries."""
+    found = []
+    for name, new in current['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if not old:
+            continue
+        if new['p90_ms'] > old['p90_ms'] * (1 + tolerance):
+            found.append(f'{name}: p90 {old["p90_ms"]}ms → {new["p90_ms"]}ms')
+        if new['queries_per_op'] > old['queries_per_op'] + 0.01:
+            found.append(f'{name}: queries/op {old["queries_per_op"]} → {new["queries_per_op"]}')
+    return found
+
+
+def git_rev():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--db', default='sqlite:////tmp/dozo_load.db')
+    ap.add_argument('--replica', help='read-replica URL; a sqlite:/// path is filled with a copy of --db after seeding')
+    ap.add_argument('--users', type=int, default=100)
+    ap.add_argument('--todos', type=int, default=100, help='todos per user')
+    ap.add_argument('--requests', type=int, default=500, help='requests per read scenario')
+    ap.add_argument('--logins', type=int, default=50)
+    ap.add_argument('--concurrency', type=int, default=1)
+    ap.add_argument('--rounds', type=int, default=TestConfig.BCRYPT_LOG_ROUNDS, help='bcrypt cost for seeded users')
+    ap.add_argument('--password-pool', type=int, default=0, help='PASSWORD_POOL_SIZE (0 hashes inline)')
+    ap.add_argument('--smtp-delay', type=float, default=0.0, help='seconds the sink stalls per message')
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--out', help='write the JSON report here instead of stdout')
+    ap.add_argument('--baseline', help='earlier report to compare against; exit 1 on regressions')
+    ap.add_argument('--tolerance', type=float, default=0.2, help='allowed p90 slowdown vs the baseline')
+    args = ap.parse_args()
+
+    if args.db.startswith('sqlite:///') and os.path.exists(args.db[len('sqlite:///'):]):
+        os.remove(args.db[len('sqlite:///'):])     # also drops the FTS shadow tables create_all can't
+
+    sink = SMTPSink(delay=args.smtp_delay).start()
+    configs['bench'] = type('BenchConfig', (TestConfig,), {
+        'SQLALCHEMY_DATABASE_URI': args.db,
+        'METRICS_ENABLED': True, 'METRICS_QUERY_WARN': 10 ** 9,
+        'MAIL_SERVER': sink.host, 'MAIL_PORT': sink.port, 'MAIL_USE_TLS': False,
+        'MAIL_USERNAME': None, 'MAIL_PASSWORD': None, 'MAIL_DEFAULT_SENDER': 'bench@bench.local',
+        'MAIL_SUPPRESS_SEND': False,
+        'BCRYPT_LOG_ROUNDS': args.rounds, 'PASSWORD_POOL_SIZE': args.password_pool,
+        'SQLALCHEMY_BINDS': {'replica': args.replica} if args.replica else {},
+    })
+    app = create_app('bench')
+
+    random.seed(args.seed)
+    with app.app_context():
+        db.drop_all(bind_key=None)
+        db.create_all(bind_key=None)
+        t0 = time.perf_counter()
+        seed(args.users, args.todos, password_hash=passwords.hash_password(PASSWORD))
+        seeded = time.perf_counter() - t0
+        if args.replica and args.replica.startswith('sqlite:///') and args.db.startswith('sqlite:///'):
+            db.engines['replica'].dispose()
+            shutil.copy(args.db[len('sqlite:///'):], args.replica[len('sqlite:///'):])
+    print(f'seeded {args.users} users × {args.todos} todos in {seeded:.1f}s', file=sys.stderr)
+
+    report = {
+        'meta': dict(rev=git_rev(), at=datetime.utcnow().isoformat(timespec='seconds'),
+                     python=platform.python_version(), db=app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0],
+                     replica=bool(args.replica),
+                     **{k: v for k, v in vars(args).items() if k not in ('out', 'baseline', 'db', 'replica')}),
+        'scenarios': scenarios(app, args, sink),
+    }
+    sink.stop()
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print('REGRESSION', line, file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
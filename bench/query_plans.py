@@ -0,0 +1,119 @@
+"""Seed a large dataset and print the plans of the Todo hot queries.
+
+    python bench/query_plans.py --db sqlite:////tmp/dozo_bench.db --users 200 --todos 500
+    python bench/query_plans.py --db postgresql://localhost/dozo_bench --drop-indexes
+
+Run once with ``--drop-indexes`` and once without to compare sequential scans
+against the composite/partial indexes from migrations d958ff42536b and
+a41e7c93d2b8. The sweep entries show one mid-sweep keyset page, the way
+``scheduler._user_batches`` fetches them.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MAIL_PORT', '25')
+os.environ.setdefault('REMINDER_MINUTES_BEFORE', '60')
+
+from sqlalchemy import insert, text                                  # noqa: E402
+from config import configs, TestConfig                               # noqa: E402
+from app import create_app, db                                       # noqa: E402
+from app.models import User, Todo, due_at                            # noqa: E402
+
+INDEXES = ['ix_todos_user_created', 'ix_todos_user_completed', 'ix_todos_user_open_due',
+           'ix_todos_reminder_pending', 'ix_todos_overdue_pending',
+           'ix_todos_reminder_pending_user', 'ix_todos_overdue_pending_user']
+
+
+def seed(users, per_user, chunk=10_000, password_hash='x'):
+    today = date.today()
+    db.session.execute(insert(User), [
+        dict(id=u, username=f'user{u}', email=f'user{u}@example.com', password_hash=password_hash,
+             notify_reminder=True, notify_overdue=True, notify_digest=u % 4 == 0)
+        for u in range(1, users + 1)])
+    rows, tid = [], 0
+    for u in range(1, users + 1):
+        for _ in range(per_user):
+            tid += 1
+            due = today + timedelta(days=random.randint(-30, 30)) if random.random() < 0.6 else None
+            tm  = (datetime.min + timedelta(minutes=random.randrange(0, 1440, 15))).time() if due and random.random() < 0.5 else None
+            done = random.random() < 0.7
+            rows.append(dict(id=tid, title=f'task {tid}', user_id=u, completed=done,
+                             priority=random.choice(('low', 'normal', 'high')),
+                             created_at=datetime.utcnow() - timedelta(minutes=tid),
+                             due_date=due, due_time=tm, due_at=due_at(due, tm),
+                             reminder_sent=done, overdue_sent=done))
+            if len(rows) >= chunk:
+                db.session.execute(insert(Todo), rows)
+                rows = []
+    if rows:
+        db.session.execute(insert(Todo), rows)
+    db.session.commit()
+
+
+def hot_queries(user_id):
+    from app.scheduler import _due_window
+    today, now = date.today(), datetime.utcnow()
+    midnight   = datetime.combine(today, datetime.min.time())
+    sweep      = lambda *where: db.session.query(Todo, User).join(User, Todo.user_id == User.id)\
+                                  .filter(~Todo.completed, *where, db.tuple_(Todo.user_id, Todo.id) > (user_id, 0))\
+                                  .order_by(Todo.user_id, Todo.id).limit(500)
+    return {
+        'todos.index page': Todo.query.filter(Todo.user_id == user_id)
+                                      .order_by(Todo.created_at.desc(), Todo.id.desc()).limit(51),
+        'clear_completed': Todo.query.filter(Todo.user_id == user_id, Todo.completed),
+        'reminder sweep': sweep(~Todo.reminder_sent, User.notify_reminder.is_(True),
+                                _due_window(today, now, now + timedelta(hours=1))),
+        'overdue sweep': sweep(~Todo.overdue_sent, User.notify_overdue.is_(True), Todo.due_at < midnight),
+        'digest page': Todo.query.filter(Todo.user_id.in_(range(user_id, user_id + 200)), ~Todo.completed,
+                                         Todo.due_date <= today + timedelta(days=7))
+                                 .order_by(Todo.user_id, Todo.due_date, Todo.id),
+    }
+
+
+def explain(query):
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    if db.engine.dialect.name == 'postgresql':
+        plan = db.session.execute(text('EXPLAIN (ANALYZE, BUFFERS) ' + sql)).scalars().all()
+    else:
+        plan = [r[-1] for r in db.session.execute(text('EXPLAIN QUERY PLAN ' + sql))]
+    t0 = time.perf_counter()
+    db.session.execute(text(sql)).fetchall()
+    return plan, (time.perf_counter() - t0) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--db', default='sqlite:////tmp/dozo_bench.db')
+    ap.add_argument('--users', type=int, default=200)
+    ap.add_argument('--todos', type=int, default=500, help='todos per user')
+    ap.add_argument('--drop-indexes', action='store_true', help='show the plans without the hot-path indexes')
+    args = ap.parse_args()
+
+    configs['bench'] = type('BenchConfig', (TestConfig,), {'SQLALCHEMY_DATABASE_URI': args.db})
+    app = create_app('bench')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        t0 = time.perf_counter()
+        seed(args.users, args.todos)
+        print(f'seeded {args.users} users × {args.todos} todos in {time.perf_counter() - t0:.1f}s')
+        if args.drop_indexes:
+            for name in INDEXES:
+                db.session.execute(text(f'DROP INDEX {name}'))
+            db.session.commit()
+        db.session.execute(text('ANALYZE'))
+
+        for name, query in hot_queries(args.users // 2).items():
+            plan, ms = explain(query)
+            print(f'\n── {name} ({ms:.1f}ms)')
+            for line in plan:
+                print('   ', line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""A minimal SMTP server that accepts and counts everything, for load tests.
+
+    python bench/smtp_sink.py --port 2525          # standalone; Ctrl-C prints totals
+
+``SMTPSink`` can also run in-process (see ``bench/load.py`` and
+``tests/test_email.py``). It speaks just enough SMTP for smtplib/Flask-Mail —
+EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT — and does not offer STARTTLS or
+AUTH, so point the app at it with ``MAIL_USE_TLS = False`` and no credentials.
+
+For failure tests it can drop each connection after ``drop_after`` messages,
+answer ``451`` to the next ``tempfail`` messages, and refuse recipients in
+``reject`` with ``550``.
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        sink = self.server.sink
+        sink.connected()
+        self.reply('220 smtp-sink ready')
+        rcpts, sent = [], 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line[:4].upper()
+            if cmd == b'EHLO':
+                self.reply('250-smtp-sink')
+                self.reply('250 8BITMIME')
+            elif cmd == b'HELO':
+                self.reply('250 smtp-sink')
+            elif cmd == b'MAIL':
+                rcpts = []
+                self.reply('250 OK')
+            elif cmd == b'RCPT':
+                rcpt = line[8:].strip(b' <>\r\n').decode()
+                if rcpt in sink.reject:
+                    self.reply('550 No such user')
+                    continue
+                rcpts.append(rcpt)
+                self.reply('250 OK')
+            elif cmd == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                size = 0
+                for data in self.rfile:
+                    if data == b'.\r\n':
+                        break
+                    size += len(data)
+                if sink.delay:
+                    time.sleep(sink.delay)
+                if sink.take_tempfail():
+                    self.reply('451 Try again later')
+                    continue
+                sink.record(rcpts, size)
+                self.reply('250 OK queued')
+                sent += 1
+                if sink.drop_after and sent >= sink.drop_after:
+                    return                  # hang up without QUIT
+            elif cmd in (b'RSET', b'NOOP'):
+                self.reply('250 OK')
+            elif cmd == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads      = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """Threaded SMTP sink on ``host:port`` (0 picks a free port) that tallies messages."""
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, drop_after=0, tempfail=0, reject=()):
+        self.delay       = delay
+        self.drop_after  = drop_after
+        self.tempfail    = tempfail
+        self.reject      = set(reject)
+        self.messages    = 0
+        self.bytes       = 0
+        self.recipients  = set()
+        self.connections = 0
+        self.tempfailed  = 0
+        self._lock       = threading.Lock()
+        self._server     = _Server((host, port), _Handler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address[:2]
+
+    def record(self, rcpts, size):
+        with self._lock:
+            self.messages += 1
+            self.bytes    += size
+            self.recipients.update(rcpts)
+
+    def connected(self):
+        with self._lock:
+            self.connections += 1
+
+    def take_tempfail(self):
+        with self._lock:
+            if self.tempfail <= 0:
+                return False
+            self.tempfail   -= 1
+            self.tempfailed += 1
+            return True
+
+    def reset(self):
+        with self._lock:
+            self.messages, self.bytes, self.recipients = 0, 0, set()
+            self.connections = self.tempfailed = 0
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='smtp-sink', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=2525)
+    ap.add_argument('--delay', type=float, default=0.0, help='seconds to stall on each DATA, to mimic a slow relay')
+    args = ap.parse_args()
+
+    sink = SMTPSink(args.host, args.port, args.delay)
+    print(f'smtp sink listening on {sink.host}:{sink.port}')
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        print(f'\n{sink.messages} messages, {sink.bytes} bytes, {len(sink.recipients)} recipients')
+
+
+if __name__ == '__main__':
+    main()
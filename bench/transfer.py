@@ -0,0 +1,80 @@
+"""Import/export throughput for the streaming todo transfer endpoints.
+
+    python bench/transfer.py --rows 1000000 --db sqlite:////tmp/dozo_transfer.db
+
+Imports ``--rows`` generated records as NDJSON and CSV through
+``POST /todos/import``, then streams both exports back, reporting rows/s and
+peak RSS growth.
+"""
+import argparse
+import io
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MAIL_PORT', '25')
+os.environ.setdefault('REMINDER_MINUTES_BEFORE', '60')
+
+from config import configs, TestConfig                   # noqa: E402
+from app import create_app, db                           # noqa: E402
+from app.models import User                              # noqa: E402
+
+
+def payload(fmt, n):
+    buf = io.StringIO()
+    if fmt == 'csv':
+        buf.write('title,priority,due_date,completed\n')
+        for i in range(n):
+            buf.write(f'task {i},{("low", "normal", "high")[i % 3]},2030-01-{i % 28 + 1:02d},{i % 2 == 0}\n')
+    else:
+        for i in range(n):
+            buf.write(f'{{"title": "task {i}", "priority": "normal", "completed": {"true" if i % 2 else "false"}}}\n')
+    return buf.getvalue().encode()
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--db', default='sqlite:////tmp/dozo_transfer.db')
+    ap.add_argument('--rows', type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    configs['bench'] = type('BenchConfig', (TestConfig,), {'SQLALCHEMY_DATABASE_URI': args.db})
+    app = create_app('bench')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(User(id=1, username='bench', email='bench@bench.local', password_hash='x'))
+        db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['_user_id'] = '1'
+
+    for fmt in ('ndjson', 'csv'):
+        body = payload(fmt, args.rows)
+        t0 = time.perf_counter()
+        r = client.post('/todos/import', data={'file': (io.BytesIO(body), f'bench.{fmt}')},
+                        headers={'Accept': 'application/json'})
+        dt = time.perf_counter() - t0
+        print(f'import {fmt:<6} {r.get_json()["imported"]:>9} rows in {dt:6.1f}s — '
+              f'{args.rows / dt:>9,.0f} rows/s, peak RSS {rss_mb():.0f}MB')
+
+    for fmt in ('ndjson', 'csv'):
+        before, rows = rss_mb(), 0
+        t0 = time.perf_counter()
+        r = client.get(f'/todos/export.{fmt}', buffered=False)
+        for chunk in r.response:
+            rows += chunk.count(b'\n')
+        dt = time.perf_counter() - t0
+        print(f'export {fmt:<6} {rows:>9} rows in {dt:6.1f}s — {rows / dt:>9,.0f} rows/s, '
+              f'peak RSS +{rss_mb() - before:.0f}MB')
+
+
+if __name__ == '__main__':
+    main()
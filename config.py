@@ -11,6 +11,10 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://localhost/dozo_db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': True, 'pool_recycle': 300}
+    # read-only views and scheduler scans read from here when set (app.replica)
+    SQLALCHEMY_BINDS = {'replica': os.environ['REPLICA_DATABASE_URL']} if os.environ.get('REPLICA_DATABASE_URL') else {}
+    REPLICA_STICKY_SECS = int(os.environ.get('REPLICA_STICKY_SECS', 5))   # reads after a write stay on the primary
+    REPLICA_RETRY_SECS  = 30                                              # after a failed replica connect
 
     MAIL_SERVER         = os.environ.get('MAIL_SERVER')
     MAIL_PORT           = int(os.environ.get('MAIL_PORT'))
@@ -18,10 +22,54 @@ class Config:
     MAIL_USERNAME       = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD       = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_USERNAME')
+    MAIL_POOL_SIZE      = int(os.environ.get('MAIL_POOL_SIZE', 4))
+    MAIL_MAX_RETRIES    = int(os.environ.get('MAIL_MAX_RETRIES', 2))
+
+    OUTBOX_POLL_SECS    = int(os.environ.get('OUTBOX_POLL_SECS', 30))
+    OUTBOX_BATCH_SIZE   = 100
+    OUTBOX_MAX_ATTEMPTS = 6
+    OUTBOX_BACKOFF_SECS = 60
+    OUTBOX_CLAIM_SECS   = 300
+
+    BCRYPT_LOG_ROUNDS      = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    # per web worker; the default splits the host's cores across WEB_CONCURRENCY workers
+    PASSWORD_POOL_SIZE     = int(os.environ.get('PASSWORD_POOL_SIZE',
+                                                max(1, (os.cpu_count() or 1) // int(os.environ.get('WEB_CONCURRENCY', 1)))))
+    PASSWORD_MAX_PENDING   = 2 * PASSWORD_POOL_SIZE
+    PASSWORD_QUEUE_TIMEOUT = 5
+
+    CACHE_BACKEND       = os.environ.get('CACHE_URL')      # e.g. redis://…; unset → per-process caches
+    IDENTITY_CACHE_SECS = 60
+    ROW_CACHE_SIZE      = 20_000   # rendered task rows (app.fragments)
+    ROW_CACHE_SECS      = 3600
+
+    # change feed (app.feed): None serves SSE only from gevent workers; set 1 to force it (dev server)
+    FEED_ENABLED = {'1': True, '0': False}.get(os.environ.get('FEED_ENABLED', ''))
+
+    PURGE_CHUNK      = 1000        # rows per transaction for clear-completed and account purges
+    PURGE_INLINE_MAX = 5000        # larger accounts are purged in the background
+    PURGE_POLL_SECS  = 60
+
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 30))   # completed this long → todos_archive; 0 = off
+    ARCHIVE_CHUNK      = 1000
+    ARCHIVE_POLL_SECS  = 3600
+
+    ASSETS_BUILD_ON_START = os.environ.get('ASSETS_BUILD_ON_START', '0') == '1'    # else run `flask assets build`
+
+    METRICS_ENABLED    = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+    METRICS_TOKEN      = os.environ.get('METRICS_TOKEN')       # unset → /metrics answers loopback only
+    METRICS_QUERY_WARN = 30                                     # log calls that run more SQL than this
 
     APP_URL                 = os.environ.get('APP_URL', 'http://localhost:5000')
     REMINDER_MINUTES_BEFORE = int(os.environ.get('REMINDER_MINUTES_BEFORE'))
-    SCHEDULER_INTERVAL_MINS = 15
+    SCHEDULER_INTERVAL_MINS = 15           # reconciliation sweep; timed reminders fire from app.reminders
+    REMINDER_REFILL_SECS    = 60
+    REMINDER_HORIZON_MINS   = 10
+    SCHEDULER_BATCH_SIZE    = int(os.environ.get('SCHEDULER_BATCH_SIZE', 500))
+    DIGEST_SHARDS           = int(os.environ.get('DIGEST_SHARDS', 4))
+    DIGEST_PAGE_SIZE        = 200
+    LEADER_LEASE_SECS       = int(os.environ.get('LEADER_LEASE_SECS', 30))
+    LEADER_HEARTBEAT_SECS   = 10
 
 
 class DevConfig(Config):
@@ -31,6 +79,7 @@ class DevConfig(Config):
         f'sqlite:///{os.path.join(_root, "dozo_dev.db")}'
     )
     SQLALCHEMY_ENGINE_OPTIONS = {}
+    ASSETS_BUILD_ON_START = False          # edit CSS/JS without rebuilding
 
 
 class TestConfig(Config):
@@ -38,7 +87,11 @@ class TestConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
     SECRET_KEY = 'test-secret'
+    BCRYPT_LOG_ROUNDS  = 4
+    PASSWORD_POOL_SIZE = 0
     SQLALCHEMY_ENGINE_OPTIONS = {}
+    SQLALCHEMY_BINDS = {}
+    ASSETS_BUILD_ON_START = False
 
 
 configs = {'production': Config, 'development': DevConfig, 'testing': TestConfig}
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""archive completed todos
+
+Revision ID: 176a3b5168ae
+Revises: 8c9ec1acc94f
+Create Date: 2026-10-18 10:35:36.373235
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.search import SQLITE_FTS
+
+
+# revision identifiers, used by Alembic.
+revision = '176a3b5168ae'
+down_revision = '8c9ec1acc94f'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = 'title, priority, due_date, due_time, created_at, completed_at, user_id'
+
+
+def upgrade():
+    op.create_table('todos_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('todo_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=256), nullable=False),
+    sa.Column('priority', sa.String(length=16), nullable=False),
+    sa.Column('due_date', sa.Date(), nullable=True),
+    sa.Column('due_time', sa.Time(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_todos_archive_user', 'todos_archive', ['user_id', 'id'], unique=False)
+
+    # plain ALTERs, not batch mode: a SQLite table copy would drop the FTS triggers
+    op.add_column('todos', sa.Column('completed_at', sa.DateTime(), nullable=True))
+    # completion times were never recorded; start the archive clock for existing rows now
+    op.execute(sa.text('UPDATE todos SET completed_at = CURRENT_TIMESTAMP WHERE completed'
+                       if op.get_bind().dialect.name == 'postgresql' else
+                       'UPDATE todos SET completed_at = CURRENT_TIMESTAMP WHERE completed = 1'))
+    op.create_index('ix_todos_completed_at', 'todos', ['completed_at'], unique=False,
+                    postgresql_where=sa.text('completed'), sqlite_where=sa.text('completed = 1'))
+
+
+def downgrade():
+    # put archived rows back as completed todos before dropping the table
+    op.execute(f'INSERT INTO todos ({COLUMNS}, completed, reminder_sent, overdue_sent) '
+               f'SELECT {COLUMNS}, true, true, true FROM todos_archive')
+    op.drop_index('ix_todos_completed_at', table_name='todos',
+                  postgresql_where=sa.text('completed'), sqlite_where=sa.text('completed = 1'))
+    with op.batch_alter_table('todos', schema=None) as batch_op:
+        batch_op.drop_column('completed_at')
+    if op.get_bind().dialect.name == 'sqlite':
+        for stmt in SQLITE_FTS:
+            op.execute(stmt)
+
+    op.drop_index('ix_todos_archive_user', table_name='todos_archive')
+    op.drop_table('todos_archive')
@@ -0,0 +1,38 @@
+"""todo title search
+
+Revision ID: 3b7c1e9a2f40
+Revises: d958ff42536b
+Create Date: 2026-10-18 12:02:14.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7c1e9a2f40'
+down_revision = 'd958ff42536b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.create_index('ix_todos_title_tsv', 'todos', [sa.text("to_tsvector('simple', title)")],
+                        postgresql_using='gin')
+    elif dialect == 'sqlite':
+        from app.search import SQLITE_FTS
+        for stmt in SQLITE_FTS:
+            op.execute(stmt)
+        op.execute("INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_todos_title_tsv', table_name='todos')
+    elif dialect == 'sqlite':
+        for trigger in ('todos_fts_ai', 'todos_fts_ad', 'todos_fts_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS todos_fts')
@@ -0,0 +1,49 @@
+"""todo created_at not null
+
+Revision ID: 5d0c2a7e9b14
+Revises: 176a3b5168ae
+Create Date: 2026-10-18 11:02:14.518302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.search import SQLITE_FTS
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0c2a7e9b14'
+down_revision = '176a3b5168ae'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('todos', 'todos_archive')
+
+# rows from before created_at had a default: use the owner's sign-up time, else the epoch
+BACKFILL = ("UPDATE {table} SET created_at = COALESCE("
+            "(SELECT users.created_at FROM users WHERE users.id = {table}.user_id), "
+            "'1970-01-01 00:00:00') WHERE created_at IS NULL")
+
+
+def upgrade():
+    for table in TABLES:
+        op.execute(BACKFILL.format(table=table))
+    _set_nullable(False)
+
+
+def downgrade():
+    _set_nullable(True)
+
+
+def _set_nullable(nullable):
+    if op.get_bind().dialect.name != 'sqlite':
+        for table in TABLES:
+            op.alter_column(table, 'created_at', existing_type=sa.DateTime(), nullable=nullable)
+        return
+    # SQLite can't alter a column in place: batch mode copies the table, which keeps the
+    # reflected indexes but drops the FTS triggers on todos, so recreate them after
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=nullable)
+    for stmt in SQLITE_FTS:
+        op.execute(stmt)
@@ -0,0 +1,50 @@
+"""cascade todo deletes
+
+Revision ID: 8c9ec1acc94f
+Revises: 683383d9d991
+Create Date: 2026-10-18 10:27:27.807709
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.search import SQLITE_FTS
+
+
+# revision identifiers, used by Alembic.
+revision = '8c9ec1acc94f'
+down_revision = '683383d9d991'
+branch_labels = None
+depends_on = None
+
+
+# the initial FK was unnamed: Postgres calls it todos_user_id_fkey; SQLite batch
+# mode finds it through this naming convention
+NAMING = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+
+def _replace_fk(**kw):
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('todos', schema=None, naming_convention=NAMING) as batch_op:
+            batch_op.drop_constraint('fk_todos_user_id_users', type_='foreignkey')
+            batch_op.create_foreign_key('fk_todos_user_id_users', 'users', ['user_id'], ['id'], **kw)
+        # the table copy dropped the FTS sync triggers; the FTS rows themselves are unchanged
+        for stmt in SQLITE_FTS:
+            op.execute(stmt)
+    else:
+        op.drop_constraint('todos_user_id_fkey', 'todos', type_='foreignkey')
+        op.create_foreign_key('todos_user_id_fkey', 'todos', 'users', ['user_id'], ['id'], **kw)
+
+
+def upgrade():
+    _replace_fk(ondelete='CASCADE')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    # drop the cascade before users is copied, so nothing can cascade from it
+    _replace_fk()
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('deleted_at')
@@ -0,0 +1,35 @@
+"""sweep keyset indexes
+
+Revision ID: a41e7c93d2b8
+Revises: 5d0c2a7e9b14
+Create Date: 2026-10-18 11:14:52.730418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41e7c93d2b8'
+down_revision = '5d0c2a7e9b14'
+branch_labels = None
+depends_on = None
+
+
+PENDING = {'ix_todos_reminder_pending_user': 'reminder_sent',
+           'ix_todos_overdue_pending_user':  'overdue_sent'}
+
+
+def _where(flag):
+    return dict(postgresql_where=sa.text(f'NOT completed AND NOT {flag}'),
+                sqlite_where=sa.text(f'completed = 0 AND {flag} = 0'))
+
+
+def upgrade():
+    for name, flag in PENDING.items():
+        op.create_index(name, 'todos', ['user_id', 'id'], unique=False, **_where(flag))
+
+
+def downgrade():
+    for name, flag in PENDING.items():
+        op.drop_index(name, table_name='todos', **_where(flag))
@@ -0,0 +1,113 @@
+"""initial schema
+
+Databases that predate migrations already have ``users`` and ``todos`` (from
+``db.create_all()``), matching the definitions below; existing tables are
+left alone and only the missing ones are created, so ``flask db upgrade``
+works on them as-is. (``flask db stamp fe2136bee362`` then ``flask db
+upgrade`` is the manual equivalent, if the outbox and lease tables exist too.)
+
+Revision ID: fe2136bee362
+Revises: 
+Create Date: 2026-10-18 10:10:25.956045
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fe2136bee362'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'email_outbox' not in existing:
+        _create_outbox()
+    if 'scheduler_lease' not in existing:
+        op.create_table('scheduler_lease',
+        sa.Column('name', sa.String(length=32), nullable=False),
+        sa.Column('holder', sa.String(length=128), nullable=True),
+        sa.Column('token', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+        )
+    if 'users' not in existing:
+        _create_users()
+    if 'todos' not in existing:
+        _create_todos()
+
+
+def _create_outbox():
+    op.create_table('email_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=128), nullable=False),
+    sa.Column('recipient', sa.String(length=120), nullable=False),
+    sa.Column('subject', sa.String(length=256), nullable=False),
+    sa.Column('html', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('claim', sa.String(length=32), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_email_outbox_claim'), ['claim'], unique=False)
+        batch_op.create_index('ix_email_outbox_due', ['status', 'next_attempt_at'], unique=False)
+
+
+def _create_users():
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=64), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=256), nullable=False),
+    sa.Column('bio', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('notify_reminder', sa.Boolean(), nullable=True),
+    sa.Column('notify_overdue', sa.Boolean(), nullable=True),
+    sa.Column('notify_digest', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+        batch_op.create_index(batch_op.f('ix_users_username'), ['username'], unique=True)
+
+
+def _create_todos():
+    op.create_table('todos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=256), nullable=False),
+    sa.Column('completed', sa.Boolean(), nullable=False),
+    sa.Column('priority', sa.String(length=16), nullable=False),
+    sa.Column('due_date', sa.Date(), nullable=True),
+    sa.Column('due_time', sa.Time(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('reminder_sent', sa.Boolean(), nullable=True),
+    sa.Column('overdue_sent', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('todos')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_username'))
+        batch_op.drop_index(batch_op.f('ix_users_email'))
+
+    op.drop_table('users')
+    op.drop_table('scheduler_lease')
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.drop_index('ix_email_outbox_due')
+        batch_op.drop_index(batch_op.f('ix_email_outbox_claim'))
+
+    op.drop_table('email_outbox')
+    # ### end Alembic commands ###
@@ -0,0 +1,9 @@
+import os
+import sys
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [_root, os.path.join(_root, 'bench')]
+
+# config.py reads these at import time
+os.environ.setdefault('MAIL_PORT', '25')
+os.environ.setdefault('REMINDER_MINUTES_BEFORE', '60')
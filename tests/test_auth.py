@@ -0,0 +1,60 @@
+"""Sign-in and sign-up while the password hashing pool is saturated."""
+import pytest
+from app import create_app, db, passwords
+from app.models import User
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all(bind_key=None)
+        user = User(username='alice', email='alice@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all(bind_key=None)
+
+
+@pytest.fixture
+def busy(monkeypatch):
+    """Make ``hash_password`` (or everything, with ``busy.all = True``) raise ``PasswordPoolBusy``."""
+    def run(fn, *args):
+        if fn is passwords._hash or state.all:
+            raise passwords.PasswordPoolBusy('saturated')
+        return fn(*args)
+    state = type('Busy', (), {'all': False})()
+    monkeypatch.setattr(passwords, '_run', run)
+    return state
+
+
+def login(client):
+    return client.post('/auth/login', data={'email': 'alice@example.com', 'password': 'password123'})
+
+
+def test_login_skips_rehash_when_busy(app, busy):
+    app.config['BCRYPT_LOG_ROUNDS'] = 12           # the stored hash now needs upgrading
+    old = User.query.one().password_hash
+    client = app.test_client()
+    r = login(client)
+    assert r.status_code == 302 and r.location.endswith('/todos/')
+    assert User.query.one().password_hash == old
+    assert client.get('/todos/').status_code == 200
+
+
+def test_login_busy_checking_is_503(app, busy):
+    busy.all = True
+    r = login(app.test_client())
+    assert r.status_code == 503
+    assert r.headers['Retry-After']
+    assert b'try again' in r.data and b'Invalid email' not in r.data
+
+
+def test_register_busy_is_503(app, busy):
+    r = app.test_client().post('/auth/register', data={'username': 'bob', 'email': 'bob@example.com',
+                                                       'password': 'password123', 'confirm': 'password123'})
+    assert r.status_code == 503
+    assert b'try again' in r.data
+    assert User.query.filter_by(username='bob').first() is None
@@ -0,0 +1,67 @@
+"""``POST /todos/bulk`` and the reminder flags it resets."""
+from datetime import date
+import pytest
+from app import create_app, db, leader, scheduler
+from app.models import EmailOutbox, Todo, User
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all(bind_key=None)
+        yield app
+        db.session.remove()
+        db.drop_all(bind_key=None)
+
+
+@pytest.fixture
+def user(app):
+    user = User(username='alice', email='alice@example.com')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def client(app, user):
+    client = app.test_client()
+    client.post('/auth/login', data={'email': 'alice@example.com', 'password': 'password123'})
+    return client
+
+
+def add(user, **kw):
+    todo = Todo(title='t', user_id=user.id, due_date=date.today(), **kw)
+    db.session.add(todo)
+    db.session.commit()
+    return todo.id
+
+
+def flags(id):
+    todo = db.session.get(Todo, id, populate_existing=True)
+    return todo.completed, todo.reminder_sent, todo.overdue_sent
+
+
+def test_uncomplete_leaves_notified_active_tasks_alone(app, user, client):
+    active = add(user, reminder_sent=True, overdue_sent=True)
+    done   = add(user, completed=True, reminder_sent=True, overdue_sent=True)
+
+    r = client.post('/todos/bulk', json={'ids': [active, done], 'op': 'uncomplete'})
+    assert r.status_code == 200
+    assert flags(active) == (False, True, True)
+    assert flags(done) == (False, False, False)
+
+    db.session.get(Todo, done).reminder_sent = True   # only ``active`` is under test
+    db.session.commit()
+    assert leader.heartbeat()
+    scheduler._check_reminders(app)
+    assert EmailOutbox.query.count() == 0
+
+
+def test_complete_keeps_completed_at_of_done_tasks(app, user, client):
+    done = add(user, completed=True)
+    stamp = db.session.get(Todo, done).completed_at
+    r = client.post('/todos/bulk', json={'ids': [done], 'op': 'complete'})
+    assert r.status_code == 200
+    assert db.session.get(Todo, done, populate_existing=True).completed_at == stamp
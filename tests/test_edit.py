@@ -0,0 +1,66 @@
+"""The edit modal round-trips every field, and reminder flags only reset on a new due time."""
+from datetime import date, time, timedelta
+import pytest
+from app import create_app, db
+from app.models import Todo, User
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all(bind_key=None)
+        yield app
+        db.session.remove()
+        db.drop_all(bind_key=None)
+
+
+@pytest.fixture
+def todo(app):
+    user = User(username='alice', email='alice@example.com')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.flush()
+    todo = Todo(title='call', priority='high', user_id=user.id, due_date=date.today() + timedelta(days=1),
+                due_time=time(9, 30), reminder_sent=True, overdue_sent=True)
+    db.session.add(todo)
+    db.session.commit()
+    return todo
+
+
+@pytest.fixture
+def client(app, todo):
+    client = app.test_client()
+    client.post('/auth/login', data={'email': 'alice@example.com', 'password': 'password123'})
+    return client
+
+
+def edit(client, todo, **changes):
+    data = {'title': todo.title, 'priority': todo.priority,
+            'due_date': todo.due_date.isoformat(), 'due_time': todo.due_time.strftime('%H:%M'), **changes}
+    return client.post(f'/todos/{todo.id}/edit', data=data)
+
+
+def test_modal_is_prefilled_from_the_row(client, todo):
+    html = client.get('/todos/').get_data(as_text=True)
+    assert 'id="editDueTime"' in html
+    assert f'data-due-date="{todo.due_date.isoformat()}"' in html
+    assert 'data-due-time="09:30"' in html and 'data-priority="high"' in html
+
+
+def test_title_edit_keeps_due_time_and_flags(client, todo):
+    assert edit(client, todo, title='call back').status_code == 302
+    todo = db.session.get(Todo, todo.id, populate_existing=True)
+    assert (todo.title, todo.due_time) == ('call back', time(9, 30))
+    assert todo.reminder_sent and todo.overdue_sent
+
+
+def test_new_due_time_rearms_reminder(client, todo):
+    assert edit(client, todo, due_time='11:00').status_code == 302
+    todo = db.session.get(Todo, todo.id, populate_existing=True)
+    assert todo.due_time == time(11, 0)
+    assert not todo.reminder_sent and not todo.overdue_sent
+
+
+def test_edit_page_renders(client, todo):
+    assert client.get(f'/todos/{todo.id}/edit').status_code == 200
@@ -0,0 +1,79 @@
+"""``send_bulk`` against a local SMTP sink (``bench/smtp_sink.py``)."""
+import pytest
+from config import configs, TestConfig
+from smtp_sink import SMTPSink
+from app import create_app
+from app.email import _message, send_bulk
+
+
+@pytest.fixture
+def sink():
+    s = SMTPSink().start()
+    yield s
+    s.stop()
+
+
+@pytest.fixture(autouse=True)
+def app(sink):
+    configs['smtp-test'] = type('SMTPTestConfig', (TestConfig,), {
+        'MAIL_SERVER': sink.host, 'MAIL_PORT': sink.port, 'MAIL_USE_TLS': False,
+        'MAIL_USERNAME': None, 'MAIL_PASSWORD': None, 'MAIL_DEFAULT_SENDER': 'dozo@example.com',
+        'MAIL_SUPPRESS_SEND': False, 'MAIL_POOL_SIZE': 1, 'MAIL_MAX_RETRIES': 2,
+    })
+    app = create_app('smtp-test')
+    with app.app_context():
+        yield app
+
+
+def messages(n, to='user{}@example.com'):
+    return [_message(f'subject {i}', to.format(i), '<p>hi</p>') for i in range(n)]
+
+
+def test_reuses_one_connection(sink):
+    assert send_bulk(messages(20)) == [True] * 20
+    assert sink.messages == 20
+    assert sink.connections == 1
+
+
+def test_pool_opens_one_connection_per_worker(app, sink):
+    app.config['MAIL_POOL_SIZE'] = 3
+    assert send_bulk(messages(30)) == [True] * 30
+    assert sink.connections == 3
+
+
+def test_reconnects_after_server_drops_connection(sink):
+    sink.drop_after = 4
+    assert send_bulk(messages(10)) == [True] * 10
+    assert sink.messages == 10
+    assert sink.connections == 3
+
+
+def test_retries_transient_failures_then_succeeds(sink):
+    sink.tempfail = 2                   # MAIL_MAX_RETRIES
+    assert send_bulk(messages(3)) == [True] * 3
+    assert sink.tempfailed == 2
+    assert sink.messages == 3
+
+
+def test_gives_up_after_max_retries(app, sink):
+    sink.tempfail = 3                   # one more than MAIL_MAX_RETRIES
+    assert send_bulk(messages(2)) == [False, True]
+    assert sink.tempfailed == app.config['MAIL_MAX_RETRIES'] + 1
+    assert sink.messages == 1
+
+
+def test_reports_per_message_results(sink):
+    sink.reject = {'user1@example.com', 'user3@example.com'}
+    assert send_bulk(messages(5)) == [True, False, True, False, True]
+    assert sink.messages == 3
+    assert sink.connections == 1        # a refused recipient doesn't cost the connection
+
+
+def test_unreachable_server_fails_every_message(app, sink):
+    sink.stop()
+    assert send_bulk(messages(3)) == [False] * 3
+
+
+def test_empty_batch_sends_nothing(sink):
+    assert send_bulk([]) == []
+    assert sink.connections == 0
@@ -0,0 +1,49 @@
+"""``/todos/search`` honours the sidebar filter."""
+import pytest
+from app import create_app, db
+from app.models import Todo, User
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all(bind_key=None)
+        yield app
+        db.session.remove()
+        db.drop_all(bind_key=None)
+
+
+@pytest.fixture
+def client(app):
+    user = User(username='alice', email='alice@example.com')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add_all([Todo(title='report draft', user_id=user.id),
+                        Todo(title='report final', user_id=user.id, completed=True, priority='high')])
+    db.session.commit()
+    client = app.test_client()
+    client.post('/auth/login', data={'email': 'alice@example.com', 'password': 'password123'})
+    return client
+
+
+def titles(client, **args):
+    r = client.get('/todos/search', query_string={'q': 'report', **args})
+    assert r.status_code == 200
+    return sorted(t['title'] for t in r.json['items'])
+
+
+@pytest.mark.parametrize('filter, expected', [
+    (None,        ['report draft', 'report final']),
+    ('all',       ['report draft', 'report final']),
+    ('active',    ['report draft']),
+    ('completed', ['report final']),
+    ('high',      ['report final']),
+])
+def test_search_applies_filter(client, filter, expected):
+    assert titles(client, **({'filter': filter} if filter else {})) == expected
+
+
+def test_unknown_filter_is_400(client):
+    assert client.get('/todos/search', query_string={'q': 'report', 'filter': 'bogus'}).status_code == 400
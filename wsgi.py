@@ -8,11 +8,22 @@ def when_ready(server):
     server.log.info("DOZO is up.")
 
 
+def _green(worker):
+    return type(worker).__module__ == 'gunicorn.workers.ggevent'
+
+
 def post_fork(server, worker):
-    if worker.age == 0:
-        from app import scheduler
-        scheduler.start(app)
-        server.log.info("Scheduler started in worker pid=%s", worker.pid)
+    if _green(worker):
+        # async workers serve pages and the change feed only; the scheduler, reminder
+        # queue and password pool would each pin the hub, so they live in `flask scheduler`
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+        server.log.info("gevent worker pid=%s: scheduler runs in the worker process", worker.pid)
+        return
+    # Every sync worker runs a scheduler; the lease in app.leader picks the one that sweeps.
+    from app import scheduler
+    scheduler.start(app)
+    server.log.info("Scheduler started in worker pid=%s", worker.pid)
 
 
 def worker_exit(server, worker):